@@ -1,33 +1,62 @@
 import pandas as pd
+import numpy as np
 import re
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from langdetect import detect, DetectorFactory
-from langdetect.lang_detect_exception import LangDetectException
-import openai
+import json
+import time
 from collections import Counter
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
+from functools import lru_cache, partial
 import string
+from cache_utils import make_cache_key, make_fingerprints
+from features_utils import HashingFeaturizer
+from job_utils import DEFAULT_JOB_CHUNK_ROWS, CheckpointedJob, frame_fingerprint, job_fingerprint
+from index_utils import (
+    build_link_index, get_language_block, load_or_build_link_index, match_declared_languages,
+    match_links_batch
+)
+from metrics_utils import PipelineMetrics
+from preprocess_utils import CLEAN_TEXT_PATTERN, prepare_internal_links, prepare_opportunities
+from language_utils import MIN_LANGUAGE_CONFIDENCE, detect_languages_batch
+from llm_utils import (
+    DEFAULT_MAX_RETRIES, DEFAULT_MAX_WORKERS, BudgetExceeded, RateLimiter, call_with_retries,
+    count_tokens, get_client, run_concurrently, truncate_to_tokens
+)
 
-# Set seed for consistent language detection
-DetectorFactory.seed = 0
+# sklearn, nltk, langdetect and openai are imported on first use so that importing this
+# module (and every Streamlit rerun) stays cheap and never touches the network
+NLTK_RESOURCES = {
+    'punkt': 'tokenizers/punkt',
+    'punkt_tab': 'tokenizers/punkt_tab',
+    'stopwords': 'corpora/stopwords',
+}
 
-# Download required NLTK data
-try:
-    nltk.download('punkt', quiet=True)
-    nltk.download('stopwords', quiet=True)
-except:
-    pass
+@lru_cache(maxsize=None)
+def ensure_nltk_resource(name):
+    """
+    Check once per process that an NLTK resource is installed, downloading it only if missing
+    """
+    import nltk
+    try:
+        nltk.data.find(NLTK_RESOURCES[name])
+        return True
+    except LookupError:
+        try:
+            return bool(nltk.download(name, quiet=True))
+        except Exception:
+            return False
 
-client = openai.OpenAI()
+@lru_cache(maxsize=None)
+def _load_langdetect():
+    from langdetect import detect, DetectorFactory
+    from langdetect.lang_detect_exception import LangDetectException
+    # Set seed for consistent language detection
+    DetectorFactory.seed = 0
+    return detect, LangDetectException
 
 def clean_text(text):
     """Clean and normalize text for processing"""
     if pd.isna(text):
         return ""
-    return re.sub(r"[^\w\s]", "", text.lower())
+    return CLEAN_TEXT_PATTERN.sub("", text.lower())
 
 def detect_language_enhanced(text, fallback='en'):
     """
@@ -36,6 +65,7 @@ def detect_language_enhanced(text, fallback='en'):
     if not text or len(text.strip()) < 10:
         return fallback
     
+    detect, LangDetectException = _load_langdetect()
     try:
         # First attempt with original text
         lang = detect(text)
@@ -73,30 +103,136 @@ def detect_language_enhanced(text, fallback='en'):
     
     return fallback
 
-def extract_keywords_from_text(text, top_n=10):
+LANGUAGE_NAMES = {
+    'en': 'English',
+    'es': 'Spanish', 
+    'fr': 'French',
+    'de': 'German',
+    'it': 'Italian',
+    'pt': 'Portuguese'
+}
+
+# Ways of featurizing internal link topics for matching
+LINK_FEATURIZERS = ('tfidf', 'hashing')
+
+KEYWORD_MIN_TEXT_LENGTH = 10
+KEYWORD_TOKEN = re.compile(r"\w{3,}")
+# URL scaffolding that is never a useful keyword
+URL_STOPWORDS = frozenset(['http', 'https', 'www', 'com', 'org', 'net', 'html', 'htm', 'php', 'aspx'])
+
+@lru_cache(maxsize=None)
+def get_stopwords(lang_code='en'):
+    """
+    Stopword set for a language code, loaded once per language
+    """
+    from nltk.corpus import stopwords
+    
+    language = LANGUAGE_NAMES.get((lang_code or 'en')[:2], 'English').lower()
+    ensure_nltk_resource('stopwords')
+    try:
+        return frozenset(stopwords.words(language))
+    except (LookupError, OSError):
+        try:
+            return frozenset(stopwords.words('english'))
+        except (LookupError, OSError):
+            from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+            return frozenset(ENGLISH_STOP_WORDS)
+
+@lru_cache(maxsize=None)
+def get_keyword_tokenizer(lang_code='en'):
+    """
+    Tokenizer for keyword extraction in one language: lowercase words of three or more
+    characters that are not stopwords (English stopwords and URL parts are always
+    dropped, since the text starts with the opportunity URL)
+    """
+    stop_words = get_stopwords(lang_code) | get_stopwords('en') | URL_STOPWORDS
+    
+    def tokenize(text):
+        return [token for token in KEYWORD_TOKEN.findall(text.lower()) if token not in stop_words]
+    
+    return tokenize
+
+def fit_keyword_idf(texts, langs):
+    """
+    Fixed keyword IDF fitted once over a reference corpus, for texts that arrive a few at
+    a time (e.g. service requests) and should not be weighted by whatever else arrives
+    with them. Returns ({term: idf}, idf of terms the corpus never uses).
+    """
+    doc_freq = Counter()
+    n_docs = 0
+    for text, lang in zip(texts, langs):
+        n_docs += 1
+        if text and len(text.strip()) >= KEYWORD_MIN_TEXT_LENGTH:
+            doc_freq.update(set(get_keyword_tokenizer(lang)(text)))
+    idf = {term: float(np.log((1 + n_docs) / (1 + count)) + 1) for term, count in doc_freq.items()}
+    return idf, float(np.log(1 + n_docs) + 1)
+
+def extract_keywords_batch(texts, langs, top_n=10, idf=None):
+    """
+    Extract the top_n keywords of every text at once. IDF is fitted once over the whole
+    corpus, or taken from fit_keyword_idf when given, and terms are ranked by TF-IDF (ties
+    by first appearance) in a single pass over the sparse term matrix. Returns one keyword
+    list per input text, in input order.
+    """
+    vocabulary = {}
+    terms_in_order = []
+    indices, counts, indptr = [], [], [0]
+    for text, lang in zip(texts, langs):
+        if text and len(text.strip()) >= KEYWORD_MIN_TEXT_LENGTH:
+            # Counter keeps first-appearance order, which breaks score ties below
+            for term, count in Counter(get_keyword_tokenizer(lang)(text)).items():
+                term_id = vocabulary.get(term)
+                if term_id is None:
+                    term_id = vocabulary[term] = len(terms_in_order)
+                    terms_in_order.append(term)
+                indices.append(term_id)
+                counts.append(count)
+        indptr.append(len(indices))
+    
+    n_docs = len(indptr) - 1
+    if not indices:
+        return [[] for _ in range(n_docs)]
+    
+    indices = np.asarray(indices, dtype=np.int64)
+    indptr = np.asarray(indptr, dtype=np.int64)
+    row_sizes = np.diff(indptr)
+    row_ids = np.repeat(np.arange(n_docs), row_sizes)
+    positions = np.arange(len(indices)) - indptr[row_ids]
+    
+    if idf is None:
+        # Smoothed IDF, as TfidfVectorizer computes it, fitted over the whole corpus
+        doc_freq = np.bincount(indices, minlength=len(terms_in_order))
+        term_idf = np.log((1 + n_docs) / (1 + doc_freq)) + 1
+    else:
+        known, unseen = idf
+        term_idf = np.array([known.get(term, unseen) for term in terms_in_order], dtype=np.float64)
+    scores = np.asarray(counts, dtype=np.float64) * term_idf[indices]
+    
+    # Rank every term within its row in one sort, then keep the top_n per row
+    order = np.lexsort((positions, -scores, row_ids))
+    ranks = np.arange(len(order)) - indptr[row_ids[order]]
+    kept = order[ranks < top_n]
+    terms = np.asarray(terms_in_order, dtype=object)[indices[kept]]
+    boundaries = np.cumsum(np.minimum(row_sizes, top_n))[:-1]
+    return [list(row_terms) for row_terms in np.split(terms, boundaries)]
+
+def extract_keywords_from_text(text, top_n=10, lang=None):
     """
-    Extract top keywords from text using TF-IDF and frequency analysis
+    Extract top keywords from text using TF-IDF and frequency analysis.
+    Pass lang when the language is already known to skip detecting it again.
     """
     if not text or len(text.strip()) < 10:
         return []
     
     try:
         # Get stopwords for detected language
-        lang = detect_language_enhanced(text)
-        try:
-            stop_words = set(stopwords.words('english'))  # Default to English
-            if lang in ['spanish', 'es']:
-                stop_words = set(stopwords.words('spanish'))
-            elif lang in ['french', 'fr']:
-                stop_words = set(stopwords.words('french'))
-            elif lang in ['german', 'de']:
-                stop_words = set(stopwords.words('german'))
-            elif lang in ['portuguese', 'pt']:
-                stop_words = set(stopwords.words('portuguese'))
-        except:
-            stop_words = set(stopwords.words('english'))
+        lang = lang or detect_language_enhanced(text)
+        stop_words = get_stopwords(lang)
         
         # Tokenize and clean
+        from nltk.tokenize import word_tokenize
+        ensure_nltk_resource('punkt')
+        ensure_nltk_resource('punkt_tab')
         tokens = word_tokenize(text.lower())
         tokens = [token for token in tokens if token not in string.punctuation and token not in stop_words]
         tokens = [token for token in tokens if len(token) > 2]
@@ -105,6 +241,7 @@ def extract_keywords_from_text(text, top_n=10):
         freq_dist = Counter(tokens)
         
         # Also use TF-IDF for better keyword extraction
+        from sklearn.feature_extraction.text import TfidfVectorizer
         vectorizer = TfidfVectorizer(max_features=top_n, stop_words='english')
         try:
             tfidf_matrix = vectorizer.fit_transform([text])
@@ -133,29 +270,45 @@ def extract_keywords_from_text(text, top_n=10):
         print(f"Keyword extraction error: {e}")
         return []
 
-def generate_anchor_enhanced(text_snippet, original_keyword, extracted_keywords, lang_code='en'):
+def group_identical(keys):
     """
-    Generate anchor text suggestions using both original keyword and extracted keywords
+    Group identical keys, returning the first position of each unique key and, for every
+    input position, the index of its unique key (so results can be fanned back out)
+    """
+    unique_ids = {}
+    unique_positions = []
+    inverse = np.empty(len(keys), dtype=np.int64)
+    for position, key in enumerate(keys):
+        unique_id = unique_ids.get(key)
+        if unique_id is None:
+            unique_id = unique_ids[key] = len(unique_positions)
+            unique_positions.append(position)
+        inverse[position] = unique_id
+    return np.asarray(unique_positions, dtype=np.int64), inverse
+
+ANCHOR_MODEL = "gpt-4"
+ANCHOR_TEMPERATURE = 0.7
+ANCHOR_MAX_TOKENS = 100
+# Content snippet sent per opportunity, cut with the model's tokenizer
+ANCHOR_SNIPPET_TOKENS = 75
+# gpt-4 list prices in USD per 1,000 tokens, used by cost budgets
+ANCHOR_INPUT_PRICE_PER_1K = 0.03
+ANCHOR_OUTPUT_PRICE_PER_1K = 0.06
+
+def build_anchor_prompt(text_snippet, original_keyword, extracted_keywords, lang_code='en'):
+    """
+    Build the anchor suggestion prompt for one opportunity
     """
     # Combine original keyword with top extracted keywords
     all_keywords = [original_keyword] + extracted_keywords[:5]
     keywords_text = ", ".join(all_keywords)
     
-    language_names = {
-        'en': 'English',
-        'es': 'Spanish', 
-        'fr': 'French',
-        'de': 'German',
-        'it': 'Italian',
-        'pt': 'Portuguese'
-    }
-    
-    lang_name = language_names.get(lang_code, 'English')
+    lang_name = LANGUAGE_NAMES.get(lang_code, 'English')
     
-    prompt = f"""
+    return f"""
     Based on this content and keywords, suggest 5 natural anchor texts for internal linking.
     
-    Content snippet: {text_snippet[:300]}
+    Content snippet: {truncate_to_tokens(text_snippet, ANCHOR_SNIPPET_TOKENS, ANCHOR_MODEL)}
     
     Main keyword: {original_keyword}
     Related keywords: {keywords_text}
@@ -170,42 +323,437 @@ def generate_anchor_enhanced(text_snippet, original_keyword, extracted_keywords,
     
     Provide only the anchor texts, separated by commas:
     """
+
+# Source of anchors that stand in for a failed or unaffordable model request
+FALLBACK_ANCHOR_SOURCE = "Keyword fallback"
+
+def fallback_anchors(original_keyword, extracted_keywords):
+    """
+    Anchor suggestions built from extracted keywords when the model gives nothing usable
+    """
+    anchors = []
+    for keyword in extracted_keywords[:3]:
+        if keyword.lower() != original_keyword.lower():
+            anchors.append(keyword.title())
+    return anchors
+
+# Rows are answered locally when at least this many candidates survive the anchor rules
+# and the matched page is at least this similar; everything else goes to the model
+LOCAL_ANCHOR_MIN_CANDIDATES = 3
+LOCAL_ANCHOR_MIN_SIMILARITY = 0.3
+LOCAL_ANCHOR_WORD = re.compile(r"[^\W\d_]+")
+
+def local_anchor_candidates(text_snippet, original_keyword, extracted_keywords, lang_code='en', topic=''):
+    """
+    Deterministic anchors for one opportunity: 2-4 word n-grams of the matched page topic
+    and of the opportunity text around its extracted keywords, with no stopword or URL
+    part at either end. Grams sharing two keywords rank first, then one, topic first and
+    shorter first within each.
+    """
+    stop_words = get_stopwords(lang_code) | get_stopwords('en') | URL_STOPWORDS
+    keywords = set(extracted_keywords[:5]) | set(KEYWORD_TOKEN.findall(str(original_keyword).lower()))
+    original = str(original_keyword).lower().strip()
     
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4",
+    ranked = {}
+    sources = [(topic, True), (str(original_keyword), False), (text_snippet, False)]
+    for source_rank, (text, from_topic) in enumerate(sources):
+        words = LOCAL_ANCHOR_WORD.findall(str(text).lower())
+        for size in (2, 3, 4):
+            for start in range(len(words) - size + 1):
+                gram = words[start:start + size]
+                if gram[0] in stop_words or gram[-1] in stop_words or len(set(gram)) < size:
+                    continue
+                overlap = len(keywords.intersection(gram))
+                if not from_topic and not overlap:
+                    continue
+                anchor = " ".join(gram)
+                if anchor == original or anchor in ranked:
+                    continue
+                ranked[anchor] = (-min(overlap, 2), source_rank, size, len(ranked))
+    
+    return sorted(ranked, key=ranked.get)[:5]
+
+def filter_anchor_list(anchors, original_keyword, extracted_keywords):
+    """
+    Apply the anchor filtering rules to a list of suggested anchors
+    """
+    # Filter out exact matches and very similar anchors
+    filtered_anchors = []
+    for anchor in anchors:
+        if (anchor.lower() != original_keyword.lower() and 
+            len(anchor.split()) <= 4 and 
+            len(anchor) > 2):
+            filtered_anchors.append(anchor)
+    
+    # If no good anchors generated, create some based on extracted keywords
+    if not filtered_anchors and extracted_keywords:
+        filtered_anchors = fallback_anchors(original_keyword, extracted_keywords)
+    
+    return filtered_anchors[:5] if filtered_anchors else [original_keyword]
+
+def parse_anchor_reply(anchors_text):
+    """Anchors of a comma-separated model reply"""
+    return [a.strip().strip('"').strip("'") for a in anchors_text.split(",") if a.strip()]
+
+def filter_anchor_suggestions(anchors_text, original_keyword, extracted_keywords):
+    """
+    Parse a comma-separated model reply and apply the anchor filtering rules
+    """
+    return filter_anchor_list(parse_anchor_reply(anchors_text), original_keyword, extracted_keywords)
+
+def anchor_cache_key(prompt, lang_code):
+    """Cache key of a single-opportunity anchor prompt"""
+    return make_cache_key(ANCHOR_MODEL, prompt, ANCHOR_TEMPERATURE, lang_code)
+
+def request_completion(prompt, max_tokens, rate_limiter=None, max_retries=DEFAULT_MAX_RETRIES,
+                       metrics=None, budget=None):
+    """
+    Send one chat completion within the rate limits, retrying transient errors.
+    Latency (including retries) and token usage are recorded to the optional metrics.
+    With a RunBudget, raises BudgetExceeded instead of sending a request it cannot cover.
+    """
+    prompt_tokens = count_tokens(prompt, ANCHOR_MODEL)
+    reservation = budget.reserve(prompt_tokens, max_tokens) if budget else None
+    
+    def request():
+        if rate_limiter:
+            rate_limiter.acquire(prompt_tokens + max_tokens)
+        return get_client().with_options(max_retries=0).chat.completions.create(
+            model=ANCHOR_MODEL,
             messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-            max_tokens=100,
+            temperature=ANCHOR_TEMPERATURE,
+            max_tokens=max_tokens,
         )
-        
-        anchors_text = response.choices[0].message.content.strip()
-        anchors = [a.strip().strip('"').strip("'") for a in anchors_text.split(",") if a.strip()]
-        
-        # Filter out exact matches and very similar anchors
-        filtered_anchors = []
-        for anchor in anchors:
-            if (anchor.lower() != original_keyword.lower() and 
-                len(anchor.split()) <= 4 and 
-                len(anchor) > 2):
-                filtered_anchors.append(anchor)
-        
-        # If no good anchors generated, create some based on extracted keywords
-        if not filtered_anchors and extracted_keywords:
-            for keyword in extracted_keywords[:3]:
-                if keyword.lower() != original_keyword.lower():
-                    filtered_anchors.append(keyword.title())
-        
-        return filtered_anchors[:5] if filtered_anchors else [original_keyword]
+    
+    started = time.perf_counter()
+    try:
+        response = call_with_retries(request, max_retries=max_retries)
+    except Exception:
+        if budget:
+            budget.settle(reservation)
+        if metrics:
+            metrics.record_llm_call(time.perf_counter() - started, failed=True)
+        raise
+    if budget:
+        budget.settle(reservation, getattr(response, 'usage', None))
+    if metrics:
+        metrics.record_llm_call(time.perf_counter() - started, getattr(response, 'usage', None))
+    return response.choices[0].message.content.strip()
+
+def store_cached_anchors(cache, cache_key, anchors):
+    """Cache a model reply's anchors as a JSON list, so anchors containing commas survive"""
+    cache.set(cache_key, json.dumps(anchors, ensure_ascii=False))
+
+def lookup_cached_anchors(cache, cache_key, metrics=None):
+    """
+    Cached anchors for a key (None on a miss), counted in the optional metrics. Entries
+    written before anchors were stored as JSON hold the comma-separated reply.
+    """
+    value = cache.get(cache_key)
+    if metrics:
+        metrics.record_cache(value is not None)
+    if value is None:
+        return None
+    try:
+        anchors = json.loads(value)
+    except ValueError:
+        anchors = None
+    if isinstance(anchors, list) and all(isinstance(anchor, str) for anchor in anchors):
+        return anchors
+    return parse_anchor_reply(value)
+
+def lookup_job_anchors(cache, job, metrics=None):
+    """
+    Filtered cached anchors of one (text_snippet, original_keyword, extracted_keywords,
+    lang_code) job, looked up under its single-opportunity prompt; None on a miss
+    """
+    anchors = lookup_cached_anchors(cache, anchor_cache_key(build_anchor_prompt(*job), job[3]), metrics)
+    return None if anchors is None else filter_anchor_list(anchors, job[1], job[2])
+
+def generate_anchor_enhanced(text_snippet, original_keyword, extracted_keywords, lang_code='en',
+                             rate_limiter=None, max_retries=DEFAULT_MAX_RETRIES, cache=None,
+                             metrics=None, budget=None):
+    """
+    Generate anchor text suggestions using both original keyword and extracted keywords.
+    Model replies are looked up in and stored to the optional persistent cache. Once the
+    optional RunBudget is spent, the keyword fallback is returned without a request.
+    """
+    return _generate_anchor(text_snippet, original_keyword, extracted_keywords, lang_code,
+                            rate_limiter, max_retries, cache, metrics, budget)[0]
+
+def _generate_anchor(text_snippet, original_keyword, extracted_keywords, lang_code='en',
+                     rate_limiter=None, max_retries=DEFAULT_MAX_RETRIES, cache=None,
+                     metrics=None, budget=None):
+    """
+    generate_anchor_enhanced as (anchors, final): final is False for the keyword fallback
+    after an API error or a spent budget, which a later run should retry
+    """
+    prompt = build_anchor_prompt(text_snippet, original_keyword, extracted_keywords, lang_code)
+    cache_key = anchor_cache_key(prompt, lang_code) if cache else None
+    
+    anchors = lookup_cached_anchors(cache, cache_key, metrics) if cache else None
+    if anchors is not None:
+        return filter_anchor_list(anchors, original_keyword, extracted_keywords), True
+    
+    try:
+        anchors = parse_anchor_reply(
+            request_completion(prompt, ANCHOR_MAX_TOKENS, rate_limiter, max_retries, metrics, budget)
+        )
+        if cache:
+            store_cached_anchors(cache, cache_key, anchors)
+        return filter_anchor_list(anchors, original_keyword, extracted_keywords), True
+    
+    except BudgetExceeded:
+        if metrics:
+            metrics.count('budget_fallbacks')
+        return fallback_anchors(original_keyword, extracted_keywords) or [original_keyword], False
     
     except Exception as e:
         print(f"OpenAI error: {e}")
         # Fallback to extracted keywords
-        fallback_anchors = []
-        for keyword in extracted_keywords[:3]:
-            if keyword.lower() != original_keyword.lower():
-                fallback_anchors.append(keyword.title())
-        return fallback_anchors if fallback_anchors else [original_keyword]
+        return fallback_anchors(original_keyword, extracted_keywords) or [original_keyword], False
+
+BATCH_MAX_TOKENS_PER_ITEM = 80
+
+def build_batch_anchor_prompt(items):
+    """
+    Build one prompt asking for anchors for several (item_id, job) opportunities as JSON
+    """
+    opportunities = []
+    for item_id, (text_snippet, original_keyword, extracted_keywords, lang_code) in items:
+        opportunities.append({
+            "id": item_id,
+            "content": truncate_to_tokens(text_snippet, ANCHOR_SNIPPET_TOKENS, ANCHOR_MODEL),
+            "main_keyword": original_keyword,
+            "related_keywords": [original_keyword] + extracted_keywords[:5],
+            "language": LANGUAGE_NAMES.get(lang_code, 'English'),
+        })
+    
+    return f"""
+    For each opportunity below, suggest 5 natural anchor texts for internal linking.
+    
+    Opportunities:
+    {json.dumps(opportunities, ensure_ascii=False)}
+    
+    Requirements:
+    - Each anchor should be 2-4 words maximum
+    - Should sound natural and clickable
+    - Avoid repeating the exact main keyword
+    - Use related keywords and synonyms
+    - Make them contextually relevant
+    - Write the anchors in the opportunity's language
+    
+    Respond with only a JSON object mapping every opportunity id to a list of anchor texts,
+    for example {{"1": ["first anchor", "second anchor"]}}
+    """
+
+def parse_batch_anchor_response(anchors_text, expected_ids):
+    """
+    Validate a batch reply against the expected schema, returning {item_id: [anchor, ...]}
+    for the items that are present and well formed
+    """
+    start, end = anchors_text.find("{"), anchors_text.rfind("}")
+    if start == -1 or end < start:
+        return {}
+    try:
+        data = json.loads(anchors_text[start:end + 1])
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    
+    valid = {}
+    for item_id in expected_ids:
+        anchors = data.get(item_id)
+        if (isinstance(anchors, list) and anchors and
+                all(isinstance(anchor, str) and anchor.strip() for anchor in anchors)):
+            valid[item_id] = [anchor.strip() for anchor in anchors]
+    return valid
+
+def generate_anchor_batch(jobs, rate_limiter=None, max_retries=DEFAULT_MAX_RETRIES, cache=None,
+                          metrics=None, budget=None):
+    """
+    Generate anchors for several jobs with one JSON prompt. Items missing or malformed in
+    the reply, or a batch the RunBudget cannot cover, are re-split into smaller batches and
+    retried; a single leftover item falls back to the regular one-opportunity prompt.
+    """
+    return [anchors for anchors, _ in _generate_anchor_batch(jobs, rate_limiter, max_retries, cache, metrics, budget)]
+
+def _generate_anchor_batch(jobs, rate_limiter=None, max_retries=DEFAULT_MAX_RETRIES, cache=None,
+                           metrics=None, budget=None):
+    """generate_anchor_batch as one (anchors, final) pair per job"""
+    if len(jobs) == 1:
+        return [_generate_anchor(*jobs[0], rate_limiter=rate_limiter, max_retries=max_retries,
+                                 cache=cache, metrics=metrics, budget=budget)]
+    
+    items = [(str(number), job) for number, job in enumerate(jobs, start=1)]
+    prompt = build_batch_anchor_prompt(items)
+    max_tokens = BATCH_MAX_TOKENS_PER_ITEM * len(items)
+    try:
+        parsed = parse_batch_anchor_response(
+            request_completion(prompt, max_tokens, rate_limiter, max_retries, metrics, budget),
+            [item_id for item_id, _ in items]
+        )
+    except BudgetExceeded:
+        # The batch's worst case does not fit, but smaller prompts still might: split it
+        # like a reply missing every item; single items that do not fit get the fallback
+        parsed = None
+    except Exception as e:
+        print(f"OpenAI error: {e}")
+        # The API itself failed after retries: fall back to extracted keywords
+        return [(fallback_anchors(job[1], job[2]) or [job[1]], False) for job in jobs]
+    
+    results = [None] * len(jobs)
+    missing = []
+    for position, (item_id, job) in enumerate(items):
+        if parsed is None or item_id not in parsed:
+            missing.append(position)
+            continue
+        text_snippet, original_keyword, extracted_keywords, lang_code = job
+        if cache:
+            single_prompt = build_anchor_prompt(*job)
+            store_cached_anchors(cache, anchor_cache_key(single_prompt, lang_code), parsed[item_id])
+        results[position] = filter_anchor_list(parsed[item_id], original_keyword, extracted_keywords), True
+    
+    # Retry whatever the model dropped or mangled in two smaller batches
+    if missing and metrics and parsed is not None:
+        metrics.count('batch_items_resplit', len(missing))
+    middle = (len(missing) + 1) // 2
+    for part in (missing[:middle], missing[middle:]):
+        if part:
+            retried = _generate_anchor_batch([jobs[position] for position in part],
+                                             rate_limiter, max_retries, cache, metrics, budget)
+            for position, result in zip(part, retried):
+                results[position] = result
+    return results
+
+def generate_anchors_concurrently(jobs, max_workers=DEFAULT_MAX_WORKERS, requests_per_minute=None,
+                                  tokens_per_minute=None, max_retries=DEFAULT_MAX_RETRIES,
+                                  progress_callback=None, cache=None, batch_size=1, metrics=None,
+                                  priorities=None, budget=None):
+    """
+    Generate anchors for many (text_snippet, original_keyword, extracted_keywords, lang_code)
+    jobs with a bounded number of OpenAI requests in flight; results are in input order.
+    With batch_size > 1, up to batch_size uncached opportunities share one JSON prompt.
+    Requests are sent highest priorities first, so when the optional RunBudget runs out
+    it is the lowest priority jobs that get the keyword fallback. Returns one
+    (anchors, final) pair per job; final is False for keyword fallbacks (API errors or a
+    spent budget), which are not worth keeping for later runs.
+    """
+    rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    jobs = list(jobs)
+    results = [None] * len(jobs)
+    order = range(len(jobs))
+    if priorities is not None:
+        order = sorted(order, key=lambda position: -priorities[position])
+    
+    if batch_size <= 1:
+        def worker(position):
+            return _generate_anchor(
+                *jobs[position], rate_limiter=rate_limiter, max_retries=max_retries, cache=cache,
+                metrics=metrics, budget=budget
+            )
+        
+        for position, result in zip(order, run_concurrently(
+                order, worker, max_workers=max_workers, progress_callback=progress_callback)):
+            results[position] = result
+        return results
+    
+    pending = []
+    for position in order:
+        job = jobs[position]
+        anchors = lookup_job_anchors(cache, job, metrics) if cache else None
+        if anchors is None:
+            pending.append(position)
+        else:
+            results[position] = anchors, True
+    
+    batches = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+    
+    def batch_worker(batch):
+        return _generate_anchor_batch([jobs[position] for position in batch],
+                                      rate_limiter, max_retries, cache, metrics, budget)
+    
+    def batch_progress(completed, total):
+        if progress_callback:
+            progress_callback(min(completed * batch_size, len(pending)), len(pending))
+    
+    for batch, results_per_job in zip(batches, run_concurrently(
+            batches, batch_worker, max_workers=max_workers, progress_callback=batch_progress)):
+        for position, result in zip(batch, results_per_job):
+            results[position] = result
+    return results
+
+def link_featurizer(langs):
+    """
+    Hashing featurizer for internal links in these languages, with each supported
+    language's own stopwords
+    """
+    prefixes = {str(lang)[:2] for lang in langs}
+    return HashingFeaturizer({prefix: get_stopwords(prefix) for prefix in prefixes if prefix in LANGUAGE_NAMES})
+
+def prepare_link_index(internal_links_df, stake_topic_col, stake_url_col, stake_lang_col, index_dir=None,
+                       featurizer='tfidf', n_jobs=1, lsa_components=0):
+    """
+    Build the TF-IDF index of the prepared internal links data with per-language blocks,
+    without modifying internal_links_df. With index_dir, a saved index for the same data
+    is loaded instead, or the latest saved index is updated incrementally and saved for
+    the next run.
+    
+    featurizer is 'tfidf' (one fitted English vocabulary of 1,000 terms) or 'hashing'
+    (per-language word and character n-grams in a fixed hashed space, featurized in
+    n_jobs processes without a global fit). With lsa_components, links are matched by
+    cosine similarity in a dense LSA projection of that many dimensions, which also pairs
+    related terms that never co-occur in one text.
+    """
+    if featurizer not in LINK_FEATURIZERS:
+        raise ValueError(f"Unknown featurizer {featurizer!r}; expected one of {', '.join(LINK_FEATURIZERS)}")
+    links = prepare_internal_links(internal_links_df, stake_topic_col, stake_url_col, stake_lang_col)
+    
+    options = {'lsa_components': lsa_components}
+    if featurizer == 'hashing':
+        options.update(featurizer=link_featurizer(links['lang'].cat.categories), n_jobs=n_jobs)
+    build = build_link_index if index_dir is None else partial(load_or_build_link_index, index_dir=index_dir)
+    return build(links['topic'], links['url'], links['lang'], **options)
+
+def build_result_frames(inverse, opp_urls, original_texts, detected_langs, keywords_per_row,
+                        best_urls, best_scores, anchor_variants_per_row, anchor_sources):
+    """
+    Fan per-unique results back out to the original rows, in their original order, as
+    columnar links and anchors DataFrames. Language and source are categorical columns.
+    """
+    opp_urls = np.asarray(opp_urls, dtype=object)
+    original_texts = np.asarray(original_texts, dtype=object)
+    languages = pd.Categorical(detected_langs)
+    top_keywords = np.array([", ".join(keywords[:5]) for keywords in keywords_per_row], dtype=object)
+    
+    links_df = pd.DataFrame({
+        "Opportunity URL": opp_urls,
+        "Suggested Internal Link": np.asarray(best_urls, dtype=object)[inverse],
+        "Original Anchor": original_texts,
+        "Detected Language": pd.Categorical.from_codes(languages.codes[inverse], languages.categories),
+        "Similarity Score": np.round(np.asarray(best_scores, dtype=np.float64), 3)[inverse],
+        "Top Keywords": top_keywords[inverse],
+    })
+    
+    # One anchor row per variant: index into the flattened variants of every unique row
+    counts = np.array([len(anchors) for anchors in anchor_variants_per_row], dtype=np.int64)
+    flat_anchors = np.array([anchor for anchors in anchor_variants_per_row for anchor in anchors], dtype=object)
+    row_counts = counts[inverse]
+    rows = np.repeat(np.arange(len(inverse)), row_counts)
+    row_offsets = np.cumsum(row_counts) - row_counts
+    unique_offsets = np.cumsum(counts) - counts
+    variants = np.repeat(unique_offsets[inverse] - row_offsets, row_counts) + np.arange(int(row_counts.sum()))
+    sources = pd.Categorical(anchor_sources)
+    
+    anchors_df = pd.DataFrame({
+        "Opportunity URL": opp_urls[rows],
+        "Original Anchor": original_texts[rows],
+        "Suggested Anchor Text": flat_anchors[variants] if len(variants) else np.array([], dtype=object),
+        "Detected Language": pd.Categorical.from_codes(languages.codes[inverse][rows], languages.categories),
+        "Source": pd.Categorical.from_codes(sources.codes[inverse][rows], sources.categories),
+    })
+    return links_df, anchors_df
 
 def match_links_and_generate_anchors(
     opportunities_df,
@@ -215,98 +763,431 @@ def match_links_and_generate_anchors(
     stake_topic_col,
     stake_url_col,
     stake_lang_col,
-    progress_callback=None
+    progress_callback=None,
+    max_workers=DEFAULT_MAX_WORKERS,
+    requests_per_minute=None,
+    tokens_per_minute=None,
+    cache=None,
+    batch_size=1,
+    min_language_confidence=MIN_LANGUAGE_CONFIDENCE,
+    link_index=None,
+    metrics=None,
+    local_anchors=True,
+    priority_col=None,
+    budget=None,
+    fetcher=None,
+    page_texts=None,
+    assigner=None
 ):
     """
-    Enhanced matching with better language detection and keyword-based anchor generation
+    Enhanced matching with better language detection and keyword-based anchor generation.
+    Anchor generation keeps up to max_workers OpenAI requests in flight, within the
+    optional requests_per_minute / tokens_per_minute budgets. Pass an AnchorCache as
+    cache to reuse model replies from earlier runs, and batch_size > 1 to pack several
+    opportunities into each prompt. Opportunities whose detected language is less
+    certain than min_language_confidence use the language column of the internal
+    links file instead. Pass link_index from prepare_link_index to reuse one index
+    across calls (e.g. chunks of a large file), and a PipelineMetrics as metrics to
+    collect per-stage timings, LLM latency and token usage and cache hit rates.
+    With local_anchors, rows whose matched page is similar enough and whose topic and
+    keywords yield enough deterministic candidates skip the model entirely. Model requests
+    are sent in order of priority_col (highest first) or else of similarity score, and stop
+    at the optional RunBudget; rows left over, like rows whose request failed, get the
+    keyword fallback with FALLBACK_ANCHOR_SOURCE as their source. progress_callback(done,
+    total) counts unique opportunities; those that need no model reply are done as soon as
+    matching is.
+    With a PageFetcher as fetcher (or already fetched page_texts, {url: text}), the text of
+    each opportunity page joins its URL and anchor for language detection, keywords and
+    link matching. With a LinkAssigner as assigner, links are assigned globally from each
+    row's top candidates under its per-page and per-source caps instead of every row
+    taking its own best page; rows left without a link get no anchors.
     """
     print("Starting enhanced matching process...")
+    metrics = metrics or PipelineMetrics()
+    
+    if page_texts is None and fetcher is not None:
+        with metrics.stage('fetch_pages'):
+            page_texts = fetcher.fetch(opportunities_df[opp_url_col].dropna().unique(), metrics)
     
-    # Prepare data
-    opportunities_df['clean_text'] = (
-        opportunities_df[opp_url_col].fillna('') + " " +
-        opportunities_df[anchor_col].fillna('')
-    ).apply(clean_text)
+    # Prepare data: read-only projections, the caller's DataFrames are never modified
+    with metrics.stage('preprocess'):
+        opportunities = prepare_opportunities(opportunities_df, opp_url_col, anchor_col, page_texts)
 
-    internal_links_df[stake_topic_col] = internal_links_df[stake_topic_col].fillna('').apply(clean_text)
-    internal_links_df[stake_lang_col] = internal_links_df[stake_lang_col].fillna('en')
+    # Build the internal link index once per run unless a prebuilt one is shared
+    if link_index is None:
+        with metrics.stage('link_index'):
+            link_index = prepare_link_index(internal_links_df, stake_topic_col, stake_url_col, stake_lang_col)
 
-    # Create vectorizer
-    vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
-    try:
-        vectorizer.fit(internal_links_df[stake_topic_col])
-    except:
-        print("Warning: TF-IDF vectorizer fitting failed, using basic matching")
-        vectorizer = None
+    opp_urls = opportunities['urls']
+    original_texts = opportunities['texts']
+    full_texts = opportunities['full_texts']
+    clean_texts = opportunities['clean_texts']
 
-    suggested_links = []
-    suggested_anchors = []
+    # Group identical opportunities so each unique input is processed once
+    with metrics.stage('deduplicate'):
+        unique_positions, inverse = group_identical(list(zip(full_texts, clean_texts)))
+    print(f"Processing {len(unique_positions)} unique of {len(full_texts)} opportunities")
+    metrics.count('opportunities', len(full_texts))
+    metrics.count('unique_opportunities', len(unique_positions))
+    unique_full_texts = full_texts[unique_positions].tolist()
+    unique_original_texts = original_texts[unique_positions].tolist()
+    unique_clean_texts = clean_texts[unique_positions].tolist()
+
+    # Classify the language of every unique opportunity in one batch; uncertain ones take
+    # the declared language of their closest internal link
+    with metrics.stage('language_detection'):
+        detected_langs, lang_confidences = detect_languages_batch(unique_full_texts)
+        uncertain = np.flatnonzero(lang_confidences < min_language_confidence)
+        if len(uncertain):
+            detected_langs[uncertain] = match_declared_languages(
+                link_index, [unique_clean_texts[i] for i in uncertain]
+            )
+        detected_langs = detected_langs.tolist()
+    metrics.count('language_fallbacks', len(uncertain))
+
+    # Keyword extraction for all unique opportunities, with IDF fitted over the corpus
+    with metrics.stage('keyword_extraction'):
+        keywords_per_row = extract_keywords_batch(unique_full_texts, detected_langs)
+
+    # Find best matching internal links for all opportunities at once
+    lang_prefixes = [lang[:2] if lang else 'en' for lang in detected_langs]
+    with metrics.stage('similarity'):
+        try:
+            best_rows, best_scores = match_links_batch(
+                link_index, unique_clean_texts, lang_prefixes, top_k=assigner.candidates if assigner else 1
+            )
+        except Exception as e:
+            print(f"Similarity scoring error: {e}")
+            best_rows = np.array([[get_language_block(link_index, prefix)['rows'][0]] for prefix in lang_prefixes])
+            best_scores = np.zeros(best_rows.shape)
     
-    total_rows = len(opportunities_df)
+    # Global assignment: spread links over pages within the caps; -1 marks rows left unlinked
+    if assigner is not None:
+        with metrics.stage('assignment'):
+            candidate_urls = np.where(best_rows >= 0, link_index['urls'][np.maximum(best_rows, 0)], None)
+            slots = assigner.assign(
+                opp_urls[unique_positions], candidate_urls, best_scores,
+                np.bincount(inverse, minlength=len(unique_positions))
+            )
+            picked = np.maximum(slots, 0)[:, None]
+            best_rows = np.where(slots[:, None] >= 0, np.take_along_axis(best_rows, picked, axis=1), -1)
+            best_scores = np.where(slots[:, None] >= 0, np.take_along_axis(best_scores, picked, axis=1), 0.0)
+        metrics.count('links_reassigned', int((slots > 0).sum()))
+        metrics.count('links_unassigned', int((slots < 0).sum()))
+    linked = best_rows[:, 0] >= 0
+
+    jobs = list(zip(unique_full_texts, unique_original_texts, keywords_per_row, detected_langs))
+    anchor_variants_per_row = [None if linked[unique_id] else [] for unique_id in range(len(jobs))]
+    llm_rows = [unique_id for unique_id in range(len(jobs)) if linked[unique_id]]
     
-    for idx, row in opportunities_df.iterrows():
-        if progress_callback:
-            progress_callback(idx + 1, total_rows)
-        
-        text = row['clean_text']
-        original_text = str(row[anchor_col])
-        full_text = str(row[opp_url_col]) + " " + original_text
-        
-        # Enhanced language detection
-        detected_lang = detect_language_enhanced(full_text)
-        
-        # Extract keywords from the content
-        extracted_keywords = extract_keywords_from_text(full_text)
-        
-        # Filter internal links by language
-        lang_prefix = detected_lang[:2] if detected_lang else 'en'
-        filtered_links = internal_links_df[
-            internal_links_df[stake_lang_col].str.startswith(lang_prefix, na=False)
-        ]
-        
-        if filtered_links.empty:
-            filtered_links = internal_links_df
-        
-        # Find best matching internal link
-        if vectorizer and not filtered_links.empty:
-            try:
-                filtered_vectors = vectorizer.transform(filtered_links[stake_topic_col])
-                text_vec = vectorizer.transform([text])
-                similarities = cosine_similarity(text_vec, filtered_vectors).flatten()
-                best_idx = similarities.argmax()
-                similarity_score = similarities[best_idx]
-            except:
-                best_idx = 0
-                similarity_score = 0.0
-        else:
-            best_idx = 0
-            similarity_score = 0.0
-        
-        best_url = filtered_links.iloc[best_idx][stake_url_col]
+    # Fast path: build anchors from the matched page topic and the extracted keywords, and
+    # only send rows with too few candidates or a weak match to the model
+    if local_anchors:
+        with metrics.stage('local_anchors'):
+            llm_rows = []
+            for unique_id, job in enumerate(jobs):
+                if not linked[unique_id]:
+                    continue
+                candidates = []
+                if best_scores[unique_id, 0] >= LOCAL_ANCHOR_MIN_SIMILARITY:
+                    topic = link_index['topics'][best_rows[unique_id, 0]]
+                    candidates = local_anchor_candidates(*job, topic=topic)
+                if len(candidates) >= LOCAL_ANCHOR_MIN_CANDIDATES:
+                    anchor_variants_per_row[unique_id] = candidates
+                else:
+                    llm_rows.append(unique_id)
+    metrics.count('anchors_local', int(linked.sum()) - len(llm_rows))
+    metrics.count('anchors_llm', len(llm_rows))
+    print(f"Anchors built locally for {int(linked.sum()) - len(llm_rows)} of {len(jobs)} unique opportunities")
+    
+    # Spend the model budget on the most valuable rows first
+    if priority_col:
+        values = pd.to_numeric(opportunities_df[priority_col], errors='coerce').fillna(-np.inf).to_numpy()
+        priorities = np.full(len(jobs), -np.inf)
+        np.maximum.at(priorities, inverse, values)
+    else:
+        priorities = best_scores[:, 0]
+    
+    # Progress covers every unique opportunity: rows that need no model reply are done now
+    done_without_model = len(jobs) - len(llm_rows)
+    model_progress = None
+    if progress_callback:
+        progress_callback(done_without_model, len(jobs))
         
-        # Generate enhanced anchor suggestions
-        anchor_variants = generate_anchor_enhanced(
-            full_text, original_text, extracted_keywords, detected_lang
+        def model_progress(done, total):
+            progress_callback(done_without_model + done, len(jobs))
+    
+    # Generate enhanced anchor suggestions for the remaining rows with bounded concurrency
+    with metrics.stage('anchor_generation'):
+        generated = generate_anchors_concurrently(
+            [jobs[unique_id] for unique_id in llm_rows],
+            max_workers=max_workers,
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+            progress_callback=model_progress,
+            cache=cache,
+            batch_size=batch_size,
+            metrics=metrics,
+            priorities=priorities[llm_rows],
+            budget=budget
         )
-        
-        # Store results
-        suggested_links.append({
-            "Opportunity URL": row[opp_url_col],
-            "Suggested Internal Link": best_url,
-            "Original Anchor": original_text,
-            "Detected Language": detected_lang,
-            "Similarity Score": round(similarity_score, 3),
-            "Top Keywords": ", ".join(extracted_keywords[:5])
+    anchor_sources = ["Keywords + Topic"] * len(jobs)
+    for unique_id, (anchors, final) in zip(llm_rows, generated):
+        anchor_variants_per_row[unique_id] = anchors
+        anchor_sources[unique_id] = "AI + Keywords" if final else FALLBACK_ANCHOR_SOURCE
+
+    with metrics.stage('build_results'):
+        links_df, anchors_df = build_result_frames(
+            inverse, opp_urls, original_texts, detected_langs, keywords_per_row,
+            np.where(linked, link_index['urls'][np.maximum(best_rows[:, 0], 0)], None), best_scores[:, 0],
+            anchor_variants_per_row, anchor_sources
+        )
+    
+    print("Matching process completed!")
+    return links_df, anchors_df
+
+def results_by_fingerprint(links_df, anchors_df, fingerprints, index_version, settings, page_texts=None):
+    """
+    Split pipeline results into one storable record per opportunity fingerprint.
+    fingerprints lists the fingerprint of every row of links_df, in order.
+    """
+    records = {}
+    for fingerprint, link, language, score, keywords in zip(
+            fingerprints, links_df["Suggested Internal Link"], links_df["Detected Language"],
+            links_df["Similarity Score"], links_df["Top Keywords"]):
+        records[fingerprint] = {
+            "link": link,
+            "language": str(language),
+            "score": float(score),
+            "keywords": keywords.split(", ") if keywords else [],
+            # Rows without anchors have no source
+            "anchors": [],
+            "source": None,
+        }
+    
+    # Anchor rows carry their opportunity's URL and text, so they fingerprint the same way.
+    # Duplicate opportunities repeat the same anchors, so keep one row's share of them.
+    occurrences = Counter(fingerprints)
+    anchor_fingerprints = make_fingerprints(
+        anchors_df["Opportunity URL"], anchors_df["Original Anchor"], index_version, settings, page_texts
+    )
+    per_row = {
+        fingerprint: count // occurrences[fingerprint]
+        for fingerprint, count in Counter(anchor_fingerprints).items()
+    }
+    anchor_rows = zip(anchor_fingerprints, anchors_df["Suggested Anchor Text"], anchors_df["Source"])
+    for fingerprint, anchor, source in anchor_rows:
+        record = records[fingerprint]
+        if len(record["anchors"]) < per_row[fingerprint]:
+            record["anchors"].append(anchor)
+            record["source"] = str(source)
+    return records
+
+def match_links_incrementally(
+    opportunities_df,
+    internal_links_df,
+    anchor_col,
+    opp_url_col,
+    stake_topic_col,
+    stake_url_col,
+    stake_lang_col,
+    store,
+    link_index=None,
+    metrics=None,
+    fetcher=None,
+    **kwargs
+):
+    """
+    match_links_and_generate_anchors for a rerun: opportunities whose fingerprint (URL,
+    anchor text, link index version and result-affecting settings, plus the page text
+    when a fetcher is given) is in the FingerprintStore reuse their stored results, and
+    only new or changed ones are processed. Fresh results are written back, except keyword
+    fallbacks, which are retried on the next run, and everything is merged in input order.
+    Keyword ranks use corpus statistics, so reused rows keep those of the run that
+    produced them. Other keyword arguments go to match_links_and_generate_anchors.
+    """
+    metrics = metrics or PipelineMetrics()
+    if link_index is None:
+        with metrics.stage('link_index'):
+            link_index = prepare_link_index(internal_links_df, stake_topic_col, stake_url_col, stake_lang_col)
+    
+    # Pages are fetched up front so a changed page counts as a changed opportunity
+    page_texts = kwargs.pop('page_texts', None)
+    if page_texts is None and fetcher is not None:
+        with metrics.stage('fetch_pages'):
+            page_texts = fetcher.fetch(opportunities_df[opp_url_col].dropna().unique(), metrics)
+    
+    opportunities = prepare_opportunities(opportunities_df, opp_url_col, anchor_col)
+    index_version = link_index['content_hash']
+    settings = {
+        'model': ANCHOR_MODEL,
+        'min_language_confidence': kwargs.get('min_language_confidence', MIN_LANGUAGE_CONFIDENCE),
+        'local_anchors': kwargs.get('local_anchors', True),
+    }
+    assigner = kwargs.get('assigner')
+    if assigner is not None:
+        settings['assignment'] = assigner.settings()
+    with metrics.stage('fingerprints'):
+        fingerprints = make_fingerprints(
+            opportunities['urls'], opportunities['texts'], index_version, settings, page_texts
+        )
+        stored = store.get_many(fingerprints)
+    changed = np.array([fingerprint not in stored for fingerprint in fingerprints], dtype=bool)
+    metrics.count('opportunities_reused', int(len(changed) - changed.sum()))
+    print(f"Reusing stored results for {len(changed) - changed.sum()} of {len(changed)} opportunities")
+    if assigner is not None:
+        # Reused links count towards the caps of the rows assigned now
+        reused = np.flatnonzero(~changed)
+        assigner.reserve(opportunities['urls'][reused], [stored[fingerprints[row]]['link'] for row in reused])
+    
+    if changed.any():
+        links_df, anchors_df = match_links_and_generate_anchors(
+            opportunities_df[changed], internal_links_df, anchor_col, opp_url_col,
+            stake_topic_col, stake_url_col, stake_lang_col,
+            link_index=link_index, metrics=metrics, page_texts=page_texts, **kwargs
+        )
+        fresh = results_by_fingerprint(
+            links_df, anchors_df, [fingerprints[row] for row in np.flatnonzero(changed)],
+            index_version, settings, page_texts
+        )
+        store.put_many({
+            fingerprint: record for fingerprint, record in fresh.items()
+            if record['source'] != FALLBACK_ANCHOR_SOURCE
         })
+        stored.update(fresh)
+    
+    with metrics.stage('merge_results'):
+        unique_positions, inverse = group_identical(fingerprints)
+        records = [stored[fingerprints[position]] for position in unique_positions]
+        return build_result_frames(
+            inverse, opportunities['urls'], opportunities['texts'],
+            [record['language'] for record in records],
+            [record['keywords'] for record in records],
+            [record['link'] for record in records],
+            [record['score'] for record in records],
+            [record['anchors'] for record in records],
+            [record['source'] for record in records]
+        )
+
+def checkpoint_settings(pipeline, **kwargs):
+    """
+    Everything besides the inputs and the link index that changes the results of a
+    checkpointed run: a job resumed with other settings (e.g. a larger budget or without
+    the anchor cache) would otherwise return chunks produced under the old ones
+    """
+    budget = kwargs.get('budget')
+    assigner = kwargs.get('assigner')
+    settings = {
+        name: kwargs.get(name)
+        for name in ('min_language_confidence', 'local_anchors', 'priority_col', 'batch_size')
+    }
+    settings.update(
+        pipeline=getattr(pipeline, 'func', pipeline).__name__,
+        cache=kwargs.get('cache') is not None,
+        budget=[budget.max_tokens, budget.max_cost] if budget else None,
+        fetch_pages=kwargs.get('fetcher') is not None,
+        assignment=assigner.settings() if assigner else None,
+    )
+    return settings
+
+def open_checkpointed_job(job_dir, inputs_fingerprint, link_index, anchor_col, opp_url_col, chunk_rows,
+                          pipeline, total_rows=None, **kwargs):
+    """
+    CheckpointedJob for running pipeline over opportunities identified by
+    inputs_fingerprint in chunks of chunk_rows; kwargs are the pipeline's keyword arguments
+    """
+    fingerprint = job_fingerprint(
+        inputs_fingerprint, link_index['content_hash'], [anchor_col, opp_url_col], chunk_rows,
+        checkpoint_settings(pipeline, **kwargs)
+    )
+    return CheckpointedJob(job_dir, fingerprint, total_rows=total_rows)
+
+def iter_checkpointed_chunks(job, chunks, run_chunk, assigner=None, progress_callback=None, metrics=None):
+    """
+    (links_df, anchors_df) of every chunk of opportunities, in order. Chunks committed to
+    job by an earlier attempt are loaded instead of run again (their links still count
+    towards the assigner's caps); the others go through run_chunk(chunk, progress_callback)
+    and are committed as they finish. The job is finished once every chunk is through.
+    """
+    metrics = metrics or PipelineMetrics()
+    total = job.total_rows
+    if job.completed_rows:
+        print(f"Resuming job: {job.completed_rows} opportunities already done")
+    metrics.count('opportunities_resumed', job.completed_rows)
+    if progress_callback:
+        progress_callback(job.completed_rows, total)
+    
+    rows = 0
+    for chunk_number, chunk in enumerate(chunks):
+        rows += len(chunk)
+        if job.is_committed(chunk_number):
+            with metrics.stage('checkpoint'):
+                links_df, anchors_df = job.load_chunk(chunk_number)
+            if assigner is not None:
+                assigner.reserve(links_df['Opportunity URL'], links_df['Suggested Internal Link'])
+            yield links_df, anchors_df
+            continue
+        done = job.completed_rows
+        
+        def chunk_progress(current, chunk_total, done=done, size=len(chunk)):
+            progress_callback(done + size * current // max(chunk_total, 1), total)
         
-        for anchor in anchor_variants:
-            suggested_anchors.append({
-                "Opportunity URL": row[opp_url_col],
-                "Original Anchor": original_text,
-                "Suggested Anchor Text": anchor,
-                "Detected Language": detected_lang,
-                "Source": "AI + Keywords"
-            })
+        links_df, anchors_df = run_chunk(chunk, chunk_progress if progress_callback else None)
+        with metrics.stage('checkpoint'):
+            job.commit(chunk_number, len(chunk), links_df, anchors_df)
+        if progress_callback:
+            progress_callback(job.completed_rows, total)
+        yield links_df, anchors_df
+    job.finish(rows)
+
+def match_links_checkpointed(
+    opportunities_df,
+    internal_links_df,
+    anchor_col,
+    opp_url_col,
+    stake_topic_col,
+    stake_url_col,
+    stake_lang_col,
+    job_dir,
+    chunk_rows=DEFAULT_JOB_CHUNK_ROWS,
+    progress_callback=None,
+    link_index=None,
+    metrics=None,
+    pipeline=None,
+    **kwargs
+):
+    """
+    Resumable match_links_and_generate_anchors: opportunities are processed in chunks of
+    chunk_rows whose results are committed to job_dir as they finish. Rerunning the same
+    job (same opportunities, internal links, columns and settings) skips every committed
+    chunk, so completed work, including paid model replies, is never redone. Progress is
+    reported from the job manifest and so starts where the previous attempt stopped.
+    Priorities and the budget apply chunk by chunk, so earlier chunks are served first.
+    pipeline (default match_links_and_generate_anchors) runs each chunk, e.g. a partial of
+    match_links_incrementally. Other keyword arguments are passed on to it.
+    """
+    metrics = metrics or PipelineMetrics()
+    pipeline = pipeline or match_links_and_generate_anchors
+    if link_index is None:
+        with metrics.stage('link_index'):
+            link_index = prepare_link_index(internal_links_df, stake_topic_col, stake_url_col, stake_lang_col)
     
-    print("Matching process completed!")
-    return pd.DataFrame(suggested_links), pd.DataFrame(suggested_anchors)
\ No newline at end of file
+    priority_col = kwargs.get('priority_col')
+    inputs = frame_fingerprint(opportunities_df, [opp_url_col, anchor_col] + ([priority_col] if priority_col else []))
+    job = open_checkpointed_job(
+        job_dir, inputs, link_index, anchor_col, opp_url_col, chunk_rows, pipeline,
+        total_rows=len(opportunities_df), **kwargs
+    )
+    
+    def run_chunk(chunk, chunk_progress):
+        return pipeline(
+            chunk, internal_links_df, anchor_col, opp_url_col,
+            stake_topic_col, stake_url_col, stake_lang_col,
+            progress_callback=chunk_progress, link_index=link_index, metrics=metrics, **kwargs
+        )
+    
+    chunks = (opportunities_df.iloc[start:start + chunk_rows] for start in range(0, len(opportunities_df), chunk_rows))
+    for _ in iter_checkpointed_chunks(job, chunks, run_chunk, kwargs.get('assigner'), progress_callback, metrics):
+        pass
+    with metrics.stage('checkpoint'):
+        return job.combined_results()
@@ -1,8 +1,26 @@
 import streamlit as st
 import pandas as pd
-import openai
+import contextlib
+import functools
+import hashlib
+import io
+import json
 import os
-from anchor_utils import match_links_and_generate_anchors
+import shutil
+from collections import Counter
+from anchor_utils import (
+    ANCHOR_INPUT_PRICE_PER_1K, ANCHOR_MODEL, ANCHOR_OUTPUT_PRICE_PER_1K, LINK_FEATURIZERS,
+    match_links_and_generate_anchors, match_links_checkpointed, match_links_incrementally,
+    prepare_link_index
+)
+from assignment_utils import LinkAssigner
+from cache_utils import AnchorCache, FingerprintStore, PageCache
+from index_utils import DEFAULT_INDEX_DIR, DEFAULT_LSA_COMPONENTS
+from export_utils import to_arrow_bytes, to_parquet_bytes
+from fetch_utils import DEFAULT_FETCH_CONCURRENCY, DEFAULT_PER_HOST_CONCURRENCY, PageFetcher
+from job_utils import DEFAULT_JOB_CHUNK_ROWS, DEFAULT_JOB_DIR, job_fingerprint
+from llm_utils import RunBudget, get_client
+from metrics_utils import PipelineMetrics, profiled
 
 # Configure page
 st.set_page_config(
@@ -11,23 +29,48 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Initialize OpenAI
-openai.api_key = os.getenv("OPENAI_API_KEY")
-client = openai.OpenAI()
-
 def test_openai_connection():
-    """Test OpenAI API connection"""
-    if not openai.api_key:
+    """Test OpenAI API connection once per session (model lookup, no tokens spent)"""
+    if st.session_state.get("openai_connection"):
+        return st.session_state["openai_connection"]
+    if not os.getenv("OPENAI_API_KEY"):
         return False, "OPENAI_API_KEY environment variable not set"
     try:
-        client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": "Test"}],
-            max_tokens=5,
-        )
-        return True, "✅ OpenAI API connected successfully"
+        get_client().models.retrieve(ANCHOR_MODEL)
     except Exception as e:
         return False, f"❌ OpenAI API error: {str(e)[:100]}..."
+    # Only successes are remembered, so a fixed key is picked up on the next rerun
+    st.session_state["openai_connection"] = (True, "✅ OpenAI API connected successfully")
+    return st.session_state["openai_connection"]
+
+@st.cache_resource
+def get_anchor_cache():
+    """Open the persistent anchor cache once per server process"""
+    return AnchorCache()
+
+@st.cache_resource
+def get_fingerprint_store():
+    """Open the persistent per-opportunity result store once per server process"""
+    return FingerprintStore()
+
+@st.cache_resource
+def get_page_cache():
+    """Open the persistent cache of fetched opportunity pages once per server process"""
+    return PageCache()
+
+def show_cache_controls():
+    """Display anchor cache statistics and a clear button"""
+    cache = get_anchor_cache()
+    with st.sidebar:
+        st.markdown("### 🗄️ Anchor Cache")
+        stats = cache.stats()
+        st.caption(
+            f"{stats['entries']} cached replies · {stats['hits']} hits · "
+            f"{stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)"
+        )
+        if st.button("🗑️ Clear anchor cache", use_container_width=True):
+            cache.clear()
+            st.success("Anchor cache cleared")
 
 def display_csv_preview(df, title, max_rows=3):
     """Display a preview of CSV data"""
@@ -42,6 +85,228 @@ def display_csv_preview(df, title, max_rows=3):
                 sample_val = str(df[col].dropna().iloc[0]) if not df[col].dropna().empty else "No data"
                 st.caption(f"Sample: {sample_val[:50]}...")
 
+def load_uploaded_csv(uploaded_file, slot):
+    """Parse an uploaded CSV once per session, keyed by a hash of its content"""
+    data = uploaded_file.getvalue()
+    file_hash = hashlib.sha256(data).hexdigest()
+    cached = st.session_state.get(f"csv_{slot}")
+    if cached is None or cached[0] != file_hash:
+        cached = (file_hash, pd.read_csv(io.BytesIO(data)))
+        st.session_state[f"csv_{slot}"] = cached
+    return cached
+
+def get_session_link_index(stake_df, stake_hash, stake_topic_col, stake_url_col, stake_lang_col,
+                           featurizer="tfidf", lsa_components=0):
+    """Build (or load the shared saved) link index once per session, column mapping and matching mode"""
+    key = (stake_hash, stake_topic_col, stake_url_col, stake_lang_col, featurizer, lsa_components)
+    cached = st.session_state.get("link_index")
+    if cached is None or cached[0] != key:
+        link_index = prepare_link_index(
+            stake_df, stake_topic_col, stake_url_col, stake_lang_col,
+            index_dir=DEFAULT_INDEX_DIR, featurizer=featurizer, lsa_components=lsa_components
+        )
+        cached = (key, link_index)
+        st.session_state["link_index"] = cached
+    return cached[1]
+
+def summarize_results(links_df, anchors_df):
+    """Precompute the Summary tab figures once per run"""
+    all_keywords = []
+    for keywords_str in links_df['Top Keywords'].dropna():
+        all_keywords.extend([k.strip() for k in keywords_str.split(',') if k.strip()])
+    
+    return {
+        "total_opportunities": len(links_df),
+        "languages": links_df['Detected Language'].nunique(),
+        "anchor_suggestions": len(anchors_df),
+        "avg_similarity": links_df['Similarity Score'].mean() if len(links_df) else 0.0,
+        "lang_counts": links_df['Detected Language'].value_counts(),
+        "top_keywords": dict(Counter(all_keywords).most_common(10)),
+    }
+
+def show_download_buttons(df, file_stem, label):
+    """CSV, Parquet and Arrow downloads of a results frame, each serialized on click"""
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button(
+            f"📥 Download {label} CSV",
+            lambda: df.to_csv(index=False),
+            f"{file_stem}.csv",
+            "text/csv",
+            use_container_width=True
+        )
+    with col2:
+        st.download_button(
+            "📥 Parquet",
+            lambda: to_parquet_bytes(df),
+            f"{file_stem}.parquet",
+            "application/vnd.apache.parquet",
+            use_container_width=True
+        )
+    with col3:
+        st.download_button(
+            "📥 Arrow",
+            lambda: to_arrow_bytes(df),
+            f"{file_stem}.arrow",
+            "application/vnd.apache.arrow.file",
+            use_container_width=True
+        )
+
+def show_results(results):
+    """Display cached results with filters, lazily generated downloads and a summary"""
+    links_df = results["links"]
+    anchors_df = results["anchors"]
+    summary = results["summary"]
+    
+    st.markdown("## 📊 Results")
+    
+    # Tabs for different views
+    tab1, tab2, tab3 = st.tabs(["🔗 Suggested Links", "💬 Anchor Texts", "📈 Summary"])
+    
+    with tab1:
+        st.markdown("### 🔗 Suggested Internal Links")
+        st.info("These are the recommended internal pages to link to from each opportunity")
+        
+        # Add filters
+        col1, col2 = st.columns(2)
+        with col1:
+            lang_filter = st.multiselect(
+                "Filter by Language:",
+                options=links_df['Detected Language'].unique(),
+                default=links_df['Detected Language'].unique()
+            )
+        with col2:
+            min_similarity = st.slider(
+                "Minimum Similarity Score:",
+                0.0, 1.0, 0.0, 0.1
+            )
+        
+        # Filter data
+        filtered_links = links_df[
+            (links_df['Detected Language'].isin(lang_filter)) &
+            (links_df['Similarity Score'] >= min_similarity)
+        ]
+        
+        st.dataframe(filtered_links, use_container_width=True)
+        
+        # Download buttons: each file is only built when its button is clicked
+        show_download_buttons(filtered_links, "suggested_internal_links", "Internal Links")
+    
+    with tab2:
+        st.markdown("### 💬 Suggested Anchor Texts")
+        st.info("AI-generated anchor text suggestions based on content analysis")
+        
+        # Filter options
+        lang_filter_anchors = st.multiselect(
+            "Filter by Language:",
+            options=anchors_df['Detected Language'].unique(),
+            default=anchors_df['Detected Language'].unique(),
+            key="anchor_lang_filter"
+        )
+        
+        filtered_anchors = anchors_df[
+            anchors_df['Detected Language'].isin(lang_filter_anchors)
+        ]
+        
+        st.dataframe(filtered_anchors, use_container_width=True)
+        
+        # Download buttons
+        show_download_buttons(filtered_anchors, "suggested_anchor_texts", "Anchor Texts")
+    
+    with tab3:
+        st.markdown("### 📈 Analysis Summary")
+        
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric("Total Opportunities", summary["total_opportunities"])
+        with col2:
+            st.metric("Languages Detected", summary["languages"])
+        with col3:
+            st.metric("Anchor Suggestions", summary["anchor_suggestions"])
+        with col4:
+            st.metric("Avg Similarity", f"{summary['avg_similarity']:.2f}")
+        
+        # Language distribution
+        st.markdown("#### Language Distribution")
+        st.bar_chart(summary["lang_counts"])
+        
+        # Top keywords
+        st.markdown("#### Most Common Keywords")
+        if summary["top_keywords"]:
+            st.bar_chart(summary["top_keywords"])
+        
+        show_assignment_report(results.get("assignment"))
+        show_run_metrics(results.get("metrics"), results.get("profile"))
+
+def show_assignment_report(assignment):
+    """How the per-page caps changed the links compared with every row taking its best page"""
+    if not assignment:
+        return
+    
+    st.markdown("#### Link Assignment")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Moved off best page", f"{assignment['reassigned']:,}")
+    with col2:
+        st.metric("Left unlinked", f"{assignment['unassigned']:,}")
+    with col3:
+        st.metric("Similarity given up", f"{assignment['similarity_given_up_share']:.1%}")
+    with col4:
+        st.metric(
+            "Pages linked", f"{assignment['pages_linked']:,}",
+            delta=assignment['pages_linked'] - assignment['pages_linked_argmax']
+        )
+    st.caption(
+        f"At most {assignment['max_links_per_page']} links per internal page, "
+        f"against {assignment['max_links_per_page_argmax']} when every opportunity takes its best match"
+    )
+
+def show_run_metrics(report, profile=None):
+    """Per-stage timings, LLM latency and token usage, and cache hit rate of the last run"""
+    if not report:
+        return
+    
+    st.markdown("#### Run Performance")
+    llm = report["llm"]
+    cache = report["cache"]
+    local = report["counters"].get("anchors_local", 0)
+    generated = report["counters"].get("anchors_llm", 0)
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("LLM p50 latency", f"{llm['p50_seconds']:.2f}s" if llm["p50_seconds"] is not None else "–")
+    with col2:
+        st.metric("LLM p95 latency", f"{llm['p95_seconds']:.2f}s" if llm["p95_seconds"] is not None else "–")
+    with col3:
+        st.metric("Tokens used", f"{llm['total_tokens']:,}")
+    with col4:
+        st.metric("Cache hit rate", f"{cache['hit_rate']:.0%}")
+    
+    stages = pd.DataFrame(
+        [(name, stage["seconds"], stage["calls"]) for name, stage in report["stages"].items()],
+        columns=["Stage", "Seconds", "Calls"]
+    )
+    st.dataframe(stages, use_container_width=True, hide_index=True)
+    st.caption(
+        f"{llm['calls']} LLM calls ({llm['errors']} failed), "
+        f"{llm['prompt_tokens']:,} prompt + {llm['completion_tokens']:,} completion tokens, "
+        f"{cache['hits']} cache hits / {cache['misses']} misses, "
+        f"{local} opportunities answered locally / {generated} sent to the model"
+    )
+    
+    st.download_button(
+        "📥 Download Run Metrics JSON",
+        lambda: json.dumps(report, indent=2),
+        "run_metrics.json",
+        "application/json",
+        use_container_width=True
+    )
+    
+    if profile:
+        with st.expander("🔬 cProfile report"):
+            st.code(profile)
+
 def show_help_section():
     """Display help information"""
     with st.sidebar:
@@ -82,6 +347,7 @@ st.markdown("*Enhanced with AI-powered keyword extraction and improved language
 
 # Show help section
 show_help_section()
+show_cache_controls()
 
 # Test OpenAI connection
 connected, msg = test_openai_connection()
@@ -118,8 +384,8 @@ with col2:
 # Load and preview files
 if opp_file and stake_file:
     try:
-        opp_df = pd.read_csv(opp_file)
-        stake_df = pd.read_csv(stake_file)
+        opp_hash, opp_df = load_uploaded_csv(opp_file, "opportunities")
+        stake_hash, stake_df = load_uploaded_csv(stake_file, "internal_links")
         
         st.success("✅ Files uploaded successfully!")
         
@@ -178,6 +444,127 @@ if opp_file and stake_file:
                     help="Column with language codes (en, es, fr, etc.)"
                 )
             
+            with st.expander("⚡ Performance Settings"):
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    max_workers = st.number_input(
+                        "Concurrent OpenAI requests",
+                        min_value=1, max_value=64, value=8,
+                        help="How many anchor generation requests are kept in flight"
+                    )
+                with col2:
+                    requests_per_minute = st.number_input(
+                        "Requests per minute (0 = no limit)",
+                        min_value=0, value=0, step=100,
+                        help="Your OpenAI requests-per-minute rate limit"
+                    )
+                with col3:
+                    tokens_per_minute = st.number_input(
+                        "Tokens per minute (0 = no limit)",
+                        min_value=0, value=0, step=10000,
+                        help="Your OpenAI tokens-per-minute rate limit"
+                    )
+                batch_size = st.number_input(
+                    "Opportunities per prompt",
+                    min_value=1, max_value=25, value=1,
+                    help="Pack several opportunities into one JSON prompt to save tokens and round trips"
+                )
+                featurizer = st.selectbox(
+                    "Link matching features",
+                    LINK_FEATURIZERS,
+                    format_func={
+                        "tfidf": "TF-IDF (English vocabulary)",
+                        "hashing": "Hashed n-grams per language",
+                    }.get,
+                    help="Hashed n-grams use each language's own stopwords plus character n-grams, "
+                         "which suits multilingual internal links"
+                )
+                dense_matching = st.checkbox(
+                    "Match on topics (LSA) instead of exact terms",
+                    value=False,
+                    help=f"Compare pages in a {DEFAULT_LSA_COMPONENTS}-dimensional latent space, "
+                         "so related wording can match even without shared words"
+                )
+                use_cache = st.checkbox(
+                    "Use cached anchor suggestions",
+                    value=True,
+                    help="Reuse model replies from earlier runs instead of calling the API again"
+                )
+                incremental = st.checkbox(
+                    "Only process new or changed opportunities",
+                    value=False,
+                    help="Reuse stored results for opportunities already processed against the same internal links"
+                )
+                checkpointed = st.checkbox(
+                    "Save progress so an interrupted run can resume",
+                    value=False,
+                    help=f"Finished chunks of {DEFAULT_JOB_CHUNK_ROWS:,} opportunities are stored on disk until the run "
+                         "completes; running the same files and settings again continues where it stopped. "
+                         "Model priorities and budgets then apply chunk by chunk, earlier chunks first."
+                )
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    priority_col = st.selectbox(
+                        "Prioritize model calls by",
+                        ["Similarity Score"] + list(opp_df.select_dtypes("number").columns),
+                        help="Opportunities with the highest values are sent to the model first "
+                             "(within each chunk when progress is saved)"
+                    )
+                with col2:
+                    token_budget = st.number_input(
+                        "Token budget (0 = no limit)",
+                        min_value=0, value=0, step=10000,
+                        help="Opportunities left when the budget is spent get keyword-based anchors; "
+                             "when progress is saved, earlier chunks spend it first"
+                    )
+                with col3:
+                    cost_budget = st.number_input(
+                        "Spend limit in USD (0 = no limit)",
+                        min_value=0.0, value=0.0, step=1.0,
+                        help=f"Estimated at {ANCHOR_MODEL} list prices"
+                    )
+                local_anchors = st.checkbox(
+                    "Build anchors locally when possible",
+                    value=True,
+                    help="Skip the model for opportunities whose matched page topic and keywords already give enough anchors"
+                )
+                col1, col2 = st.columns(2)
+                with col1:
+                    max_links_per_page = st.number_input(
+                        "Max links per internal page (0 = no cap)",
+                        min_value=0, value=0, step=10,
+                        help="Assign links across all opportunities so no internal page gets more than this many"
+                    )
+                with col2:
+                    max_links_per_source = st.number_input(
+                        "Max links per opportunity page (0 = no cap)",
+                        min_value=0, value=0,
+                        help="Limit how many internal links any one opportunity URL receives"
+                    )
+                fetch_pages = st.checkbox(
+                    "Fetch opportunity pages",
+                    value=False,
+                    help="Download each opportunity URL and use the page's main text for keywords and matching. "
+                         "Unchanged pages are not downloaded again."
+                )
+                col1, col2 = st.columns(2)
+                with col1:
+                    fetch_concurrency = st.number_input(
+                        "Concurrent page downloads",
+                        min_value=1, max_value=512, value=DEFAULT_FETCH_CONCURRENCY
+                    )
+                with col2:
+                    per_host_concurrency = st.number_input(
+                        "Concurrent downloads per site",
+                        min_value=1, max_value=64, value=DEFAULT_PER_HOST_CONCURRENCY,
+                        help="Keeps the load on any single website polite"
+                    )
+                profile_run = st.checkbox(
+                    "Profile this run (cProfile)",
+                    value=False,
+                    help="Record a function-level profile, shown in the Summary tab"
+                )
+            
             # Preview selected mappings
             st.markdown("### 📋 Selected Column Mapping Preview")
             
@@ -208,6 +595,12 @@ if opp_file and stake_file:
                 type="primary"
             )
 
+        # Results are kept per session, keyed by the uploaded files and the column mapping
+        results_key = (
+            opp_hash, stake_hash, opp_url_col, anchor_col,
+            stake_url_col, stake_topic_col, stake_lang_col, featurizer, dense_matching
+        )
+        
         # Step 3: Processing
         if submitted:
             st.markdown("## ⚙️ Processing Your Data")
@@ -221,9 +614,50 @@ if opp_file and stake_file:
                 progress_bar.progress(progress)
                 status_text.text(f"Processing {current}/{total} opportunities...")
             
+            metrics = PipelineMetrics()
+            profile = {}
+            budget = None
+            if token_budget or cost_budget:
+                budget = RunBudget(
+                    token_budget or None, cost_budget or None,
+                    ANCHOR_INPUT_PRICE_PER_1K, ANCHOR_OUTPUT_PRICE_PER_1K
+                )
+            assigner = None
+            if max_links_per_page or max_links_per_source:
+                assigner = LinkAssigner(int(max_links_per_page), int(max_links_per_source))
+            fetcher = None
+            if fetch_pages:
+                fetcher = PageFetcher(
+                    get_page_cache(),
+                    concurrency=int(fetch_concurrency),
+                    per_host_concurrency=int(per_host_concurrency)
+                )
+            
             try:
-                with st.spinner("🔍 Analyzing content and generating suggestions..."):
-                    links_df, anchors_df = match_links_and_generate_anchors(
+                with st.spinner("🔍 Analyzing content and generating suggestions..."), \
+                        (profiled() if profile_run else contextlib.nullcontext(profile)) as profile:
+                    with metrics.stage("link_index"):
+                        link_index = get_session_link_index(
+                            stake_df, stake_hash, stake_topic_col, stake_url_col, stake_lang_col,
+                            featurizer, DEFAULT_LSA_COMPONENTS if dense_matching else 0
+                        )
+                    run_pipeline = match_links_and_generate_anchors
+                    if incremental:
+                        run_pipeline = functools.partial(match_links_incrementally, store=get_fingerprint_store())
+                    job_dir = None
+                    if checkpointed:
+                        job_dir = os.path.join(
+                            DEFAULT_JOB_DIR,
+                            job_fingerprint(
+                                *results_key, local_anchors, priority_col, int(batch_size), fetch_pages,
+                                int(max_links_per_page), int(max_links_per_source), incremental, use_cache,
+                                token_budget, cost_budget
+                            )
+                        )
+                        run_pipeline = functools.partial(
+                            match_links_checkpointed, job_dir=job_dir, pipeline=run_pipeline
+                        )
+                    links_df, anchors_df = run_pipeline(
                         opp_df,
                         stake_df,
                         anchor_col=anchor_col,
@@ -231,119 +665,47 @@ if opp_file and stake_file:
                         stake_topic_col=stake_topic_col,
                         stake_url_col=stake_url_col,
                         stake_lang_col=stake_lang_col,
-                        progress_callback=update_progress
+                        progress_callback=update_progress,
+                        max_workers=int(max_workers),
+                        requests_per_minute=requests_per_minute or None,
+                        tokens_per_minute=tokens_per_minute or None,
+                        cache=get_anchor_cache() if use_cache else None,
+                        batch_size=int(batch_size),
+                        link_index=link_index,
+                        metrics=metrics,
+                        local_anchors=local_anchors,
+                        priority_col=None if priority_col == "Similarity Score" else priority_col,
+                        budget=budget,
+                        fetcher=fetcher,
+                        assigner=assigner
                     )
                 
+                st.session_state["results"] = {
+                    "key": results_key,
+                    "links": links_df,
+                    "anchors": anchors_df,
+                    "summary": summarize_results(links_df, anchors_df),
+                    "metrics": metrics.report(),
+                    "profile": profile.get("report"),
+                    "assignment": assigner.report() if assigner else None,
+                }
+                # The checkpoints only serve to resume this run; a later run starts afresh
+                if job_dir:
+                    shutil.rmtree(job_dir, ignore_errors=True)
+                
                 progress_bar.progress(1.0)
                 status_text.text("✅ Processing complete!")
                 
                 st.success("🎉 Analysis complete! Here are your results:")
                 
-                # Step 4: Results
-                st.markdown("## 📊 Results")
-                
-                # Tabs for different views
-                tab1, tab2, tab3 = st.tabs(["🔗 Suggested Links", "💬 Anchor Texts", "📈 Summary"])
-                
-                with tab1:
-                    st.markdown("### 🔗 Suggested Internal Links")
-                    st.info("These are the recommended internal pages to link to from each opportunity")
-                    
-                    # Add filters
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        lang_filter = st.multiselect(
-                            "Filter by Language:",
-                            options=links_df['Detected Language'].unique(),
-                            default=links_df['Detected Language'].unique()
-                        )
-                    with col2:
-                        min_similarity = st.slider(
-                            "Minimum Similarity Score:",
-                            0.0, 1.0, 0.0, 0.1
-                        )
-                    
-                    # Filter data
-                    filtered_links = links_df[
-                        (links_df['Detected Language'].isin(lang_filter)) &
-                        (links_df['Similarity Score'] >= min_similarity)
-                    ]
-                    
-                    st.dataframe(filtered_links, use_container_width=True)
-                    
-                    # Download button
-                    csv_links = filtered_links.to_csv(index=False)
-                    st.download_button(
-                        "📥 Download Internal Links CSV",
-                        csv_links,
-                        "suggested_internal_links.csv",
-                        "text/csv",
-                        use_container_width=True
-                    )
-                
-                with tab2:
-                    st.markdown("### 💬 Suggested Anchor Texts")
-                    st.info("AI-generated anchor text suggestions based on content analysis")
-                    
-                    # Filter options
-                    lang_filter_anchors = st.multiselect(
-                        "Filter by Language:",
-                        options=anchors_df['Detected Language'].unique(),
-                        default=anchors_df['Detected Language'].unique(),
-                        key="anchor_lang_filter"
-                    )
-                    
-                    filtered_anchors = anchors_df[
-                        anchors_df['Detected Language'].isin(lang_filter_anchors)
-                    ]
-                    
-                    st.dataframe(filtered_anchors, use_container_width=True)
-                    
-                    # Download button
-                    csv_anchors = filtered_anchors.to_csv(index=False)
-                    st.download_button(
-                        "📥 Download Anchor Texts CSV",
-                        csv_anchors,
-                        "suggested_anchor_texts.csv", 
-                        "text/csv",
-                        use_container_width=True
-                    )
-                
-                with tab3:
-                    st.markdown("### 📈 Analysis Summary")
-                    
-                    col1, col2, col3, col4 = st.columns(4)
-                    
-                    with col1:
-                        st.metric("Total Opportunities", len(links_df))
-                    with col2:
-                        st.metric("Languages Detected", len(links_df['Detected Language'].unique()))
-                    with col3:
-                        st.metric("Anchor Suggestions", len(anchors_df))
-                    with col4:
-                        avg_similarity = links_df['Similarity Score'].mean()
-                        st.metric("Avg Similarity", f"{avg_similarity:.2f}")
-                    
-                    # Language distribution
-                    st.markdown("#### Language Distribution")
-                    lang_counts = links_df['Detected Language'].value_counts()
-                    st.bar_chart(lang_counts)
-                    
-                    # Top keywords
-                    st.markdown("#### Most Common Keywords")
-                    all_keywords = []
-                    for keywords_str in links_df['Top Keywords'].dropna():
-                        all_keywords.extend([k.strip() for k in keywords_str.split(',')])
-                    
-                    if all_keywords:
-                        from collections import Counter
-                        keyword_counts = Counter(all_keywords)
-                        top_keywords = dict(keyword_counts.most_common(10))
-                        st.bar_chart(top_keywords)
-                
             except Exception as e:
                 st.error(f"❌ An error occurred during processing: {str(e)}")
                 st.info("Please check your file formats and column mappings, then try again.")
+        
+        # Step 4: Results, served from the session so filters and downloads never reprocess
+        results = st.session_state.get("results")
+        if results and results["key"] == results_key:
+            show_results(results)
     
     except Exception as e:
         st.error(f"❌ Error loading files: {str(e)}")
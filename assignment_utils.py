@@ -0,0 +1,145 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+# Candidate pages considered per opportunity by the global assignment
+DEFAULT_ASSIGNMENT_CANDIDATES = 5
+
+
+class LinkAssigner:
+    """
+    Global assignment of opportunities to internal links. Each opportunity's candidate
+    pages are ranked together with everyone else's, and links are taken greedily from
+    the most similar pair down, skipping a pair when its internal page already has
+    max_links_per_page links or its source page already has max_links_per_source. A
+    (source, page) pair is one link however many duplicate opportunities share it, so a
+    pair that already exists is reused without counting against the caps again. Counts
+    and pairs carry over between calls, so the caps hold across the chunks of one run.
+    """
+
+    def __init__(self, max_links_per_page=None, max_links_per_source=None,
+                 candidates=DEFAULT_ASSIGNMENT_CANDIDATES):
+        self.max_links_per_page = max_links_per_page or None
+        self.max_links_per_source = max_links_per_source or None
+        self.candidates = candidates
+        self.page_links = Counter()
+        self.source_links = Counter()
+        self.pairs = set()
+        # What an independent argmax per row would have done, for the report
+        self.argmax_page_links = Counter()
+        self.argmax_pairs = set()
+        self.totals = Counter()
+
+    def settings(self):
+        return {
+            'max_links_per_page': self.max_links_per_page,
+            'max_links_per_source': self.max_links_per_source,
+            'candidates': self.candidates,
+        }
+
+    def reserve(self, source_urls, target_urls):
+        """Count links that already exist (e.g. chunks restored from a checkpoint)"""
+        for source, target in zip(source_urls, target_urls):
+            if isinstance(target, str) and target and (source, target) not in self.pairs:
+                self.page_links[target] += 1
+                self.source_links[source] += 1
+                self.pairs.add((source, target))
+
+    def assign(self, source_urls, candidate_urls, candidate_scores, weights=None):
+        """
+        Choose at most one candidate per row. candidate_urls and candidate_scores are
+        (rows x candidates), best first, with None for empty slots; weights is how many
+        opportunities each row stands for (duplicates), 1 by default. Duplicates share
+        their row's one link, so weights only scale the report. Returns the chosen slot per
+        row, -1 where every candidate was capped.
+        """
+        candidate_urls = np.asarray(candidate_urls, dtype=object)
+        candidate_scores = np.asarray(candidate_scores, dtype=np.float64)
+        n_rows, n_slots = candidate_scores.shape
+        weights = np.ones(n_rows, dtype=np.int64) if weights is None else np.asarray(weights, dtype=np.int64)
+        if n_rows == 0:
+            return np.full(0, -1, dtype=np.int64)
+
+        # Every usable (row, slot) edge, most similar first; ties keep row and slot order.
+        # Zero-score candidates share no term with the opportunity and are never linked.
+        valid = pd.notna(candidate_urls) & (candidate_scores > 0)
+        edge_rows, edge_slots = np.nonzero(valid)
+        order = np.argsort(-candidate_scores[edge_rows, edge_slots], kind='stable')
+        edge_rows, edge_slots = edge_rows[order], edge_slots[order]
+        source_urls = np.asarray(source_urls, dtype=object)
+
+        # Count links on integer ids within the call and write the totals back at the end
+        target_urls = candidate_urls[edge_rows, edge_slots]
+        target_ids, targets = pd.factorize(target_urls)
+        source_ids, sources = pd.factorize(source_urls)
+        page_links = [self.page_links[target] for target in targets]
+        source_links = [self.source_links[source] for source in sources]
+        page_cap = self.max_links_per_page
+        source_cap = self.max_links_per_source
+        pairs = self.pairs
+        chosen = [-1] * n_rows
+        edges = zip(
+            edge_rows.tolist(), edge_slots.tolist(), target_ids.tolist(), source_ids[edge_rows].tolist(),
+            target_urls.tolist(), source_urls[edge_rows].tolist()
+        )
+        for row, slot, target_id, source_id, target, source in edges:
+            if chosen[row] >= 0:
+                continue
+            if (source, target) in pairs:
+                # The source already links this page: the row shares that link
+                chosen[row] = slot
+                continue
+            if page_cap and page_links[target_id] >= page_cap:
+                continue
+            if source_cap and source_links[source_id] >= source_cap:
+                continue
+            chosen[row] = slot
+            page_links[target_id] += 1
+            source_links[source_id] += 1
+            pairs.add((source, target))
+
+        for target, count in zip(targets, page_links):
+            if count:
+                self.page_links[target] = count
+        for source, count in zip(sources, source_links):
+            if count:
+                self.source_links[source] = count
+        chosen = np.asarray(chosen, dtype=np.int64)
+        self._record(source_urls, candidate_urls, candidate_scores, weights, valid, chosen)
+        return chosen
+
+    def _record(self, source_urls, candidate_urls, candidate_scores, weights, valid, chosen):
+        has_candidate = valid[:, 0]
+        assigned = chosen >= 0
+        for source, target in zip(source_urls[has_candidate], candidate_urls[has_candidate, 0]):
+            if (source, target) not in self.argmax_pairs:
+                self.argmax_pairs.add((source, target))
+                self.argmax_page_links[target] += 1
+        assigned_scores = np.where(assigned, candidate_scores[np.arange(len(chosen)), np.maximum(chosen, 0)], 0.0)
+        self.totals['links'] += int(weights.sum())
+        self.totals['reassigned'] += int(weights[chosen > 0].sum())
+        self.totals['unassigned'] += int(weights[has_candidate & ~assigned].sum())
+        self.totals['no_candidates'] += int(weights[~has_candidate].sum())
+        self.totals['argmax_similarity'] += float((candidate_scores[:, 0] * weights)[has_candidate].sum())
+        self.totals['assigned_similarity'] += float((assigned_scores * weights).sum())
+
+    def report(self):
+        """What the caps cost compared with linking every row to its own best page"""
+        argmax = self.totals['argmax_similarity']
+        given_up = argmax - self.totals['assigned_similarity']
+        return {
+            'links': self.totals['links'],
+            'reassigned': self.totals['reassigned'],
+            'unassigned': self.totals['unassigned'],
+            # Rows sharing no term with any page are never linked
+            'no_candidates': self.totals['no_candidates'],
+            'argmax_similarity': round(argmax, 3),
+            'assigned_similarity': round(self.totals['assigned_similarity'], 3),
+            'similarity_given_up': round(given_up, 3),
+            'similarity_given_up_share': round(given_up / argmax, 4) if argmax else 0.0,
+            'pages_linked': len([count for count in self.page_links.values() if count]),
+            'pages_linked_argmax': len(self.argmax_page_links),
+            'max_links_per_page': max(self.page_links.values(), default=0),
+            'max_links_per_page_argmax': max(self.argmax_page_links.values(), default=0),
+        }
@@ -0,0 +1,135 @@
+"""
+Local stand-in for the OpenAI chat completions API, so the pipeline can be benchmarked
+offline. Replies follow the prompt formats built in anchor_utils, after a configurable
+latency, and a configurable share of requests fail with 429 or 500.
+
+    python benchmarks/fake_openai.py --port 8765 --latency-ms 200 --error-rate 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake python cli.py ...
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MAIN_KEYWORD = re.compile(r"Main keyword: (.*)")
+BATCH_ITEMS = re.compile(r"^\s*(\[\{.*\}\])\s*$", re.MULTILINE)
+
+
+def fake_anchors(keyword):
+    words = keyword.split() or ["page"]
+    return [f"{words[0]} guide", f"best {words[-1]}", f"{keyword} tips", f"about {words[0]}", f"{words[-1]} overview"]
+
+
+def fake_reply(prompt):
+    """Reply text in the format the prompt asks for"""
+    batch = BATCH_ITEMS.search(prompt)
+    if batch:
+        items = json.loads(batch.group(1))
+        return json.dumps({item["id"]: fake_anchors(item["main_keyword"]) for item in items}, ensure_ascii=False)
+    match = MAIN_KEYWORD.search(prompt)
+    return ", ".join(fake_anchors(match.group(1).strip() if match else "page"))
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, seed=0):
+        super().__init__((host, port), FakeOpenAIHandler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def draw(self):
+        """Latency in seconds and whether this request fails"""
+        with self.lock:
+            self.requests += 1
+            delay = max(0.0, self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            failed = self.random.random() < self.error_rate
+            self.errors += failed
+        return delay, failed
+
+    def start(self):
+        """Serve from a daemon thread; returns self"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path.startswith("/v1/models/"):
+            model = self.path.rsplit("/", 1)[-1]
+            return self.send_json(200, {"id": model, "object": "model", "created": 0, "owned_by": "fake"})
+        self.send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.path != "/v1/chat/completions":
+            return self.send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+
+        delay, failed = self.server.draw()
+        time.sleep(delay)
+        if failed:
+            status = self.server.random.choice([429, 500])
+            return self.send_json(status, {"error": {"message": "injected failure", "type": "server_error"}})
+
+        prompt = request["messages"][-1]["content"]
+        content = fake_reply(prompt)
+        prompt_tokens = len(prompt) // 4 + 1
+        completion_tokens = len(content) // 4 + 1
+        self.send_json(200, {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a fake OpenAI chat completions API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    server = FakeOpenAIServer(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    print(f"Fake OpenAI API on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+End-to-end benchmarks for match_links_and_generate_anchors.
+
+Each size runs in its own process against a local fake OpenAI server (no network or API
+key needed) and reports throughput, peak memory and per-stage timings. Save a run as a
+baseline, then compare later runs against it to catch regressions:
+
+    python benchmarks/run_benchmarks.py --sizes 1000 10000 --save-baseline main
+    python benchmarks/run_benchmarks.py --sizes 1000 10000 --compare main
+
+--compare exits with status 1 when throughput drops or peak memory grows by more than
+--tolerance, so it can gate a release.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+DATA_DIR = os.path.join(BENCHMARK_DIR, "data")
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+BASELINE_DIR = os.path.join(BENCHMARK_DIR, "baselines")
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+DEFAULT_TOLERANCE = 0.15
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the matching and anchor generation pipeline offline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Opportunity rows per run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Mean fake API latency")
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.01, help="Share of requests answered with 429/500")
+    parser.add_argument("--max-workers", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--output", default=None, help="Results JSON (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--save-baseline", metavar="NAME", help="Also save the results as a named baseline")
+    parser.add_argument("--compare", metavar="NAME", help="Compare against a named baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative throughput drop / peak memory growth")
+    parser.add_argument("--run-one", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def run_one(config):
+    """Child process: run the pipeline once on one dataset and print the result as JSON"""
+    sys.path.insert(0, REPO_DIR)
+    started = time.perf_counter()
+    import pandas as pd
+    from anchor_utils import match_links_and_generate_anchors
+    from metrics_utils import PipelineMetrics
+
+    opportunities_df = pd.read_csv(config["opportunities"])
+    internal_links_df = pd.read_csv(config["internal_links"])
+    metrics = PipelineMetrics()
+    pipeline_started = time.perf_counter()
+    links_df, anchors_df = match_links_and_generate_anchors(
+        opportunities_df,
+        internal_links_df,
+        anchor_col="keyword",
+        opp_url_col="url",
+        stake_topic_col="topic",
+        stake_url_col="url",
+        stake_lang_col="lang",
+        max_workers=config["max_workers"],
+        batch_size=config["batch_size"],
+        metrics=metrics
+    )
+    pipeline_seconds = time.perf_counter() - pipeline_started
+
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    result = {
+        "rows": len(opportunities_df),
+        "link_rows": len(internal_links_df),
+        "anchor_rows": len(anchors_df),
+        "seconds": pipeline_seconds,
+        "total_seconds": time.perf_counter() - started,
+        "rows_per_second": len(opportunities_df) / pipeline_seconds if pipeline_seconds else 0.0,
+        "peak_rss_mb": peak_rss_mb,
+        **metrics.report(),
+    }
+    print(json.dumps(result))
+
+
+def run_size(args, server, rows):
+    """Run one size in a fresh process so peak memory is measured per size"""
+    from synthetic_data import ensure_dataset
+
+    opportunities, internal_links = ensure_dataset(DATA_DIR, rows, seed=args.seed)
+    config = {
+        "opportunities": opportunities,
+        "internal_links": internal_links,
+        "max_workers": args.max_workers,
+        "batch_size": args.batch_size,
+    }
+    env = dict(os.environ, OPENAI_BASE_URL=server.base_url, OPENAI_API_KEY="fake-key")
+    requests_before, errors_before = server.requests, server.errors
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-one", json.dumps(config)],
+        env=env, cwd=REPO_DIR, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark for {rows} rows failed:\n{completed.stderr}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["server"] = {"requests": server.requests - requests_before, "errors": server.errors - errors_before}
+    return result
+
+
+def compare_results(results, baseline, tolerance):
+    """Print a comparison table and return the list of regressions"""
+    regressions = []
+    print(f"\n{'rows':>8} {'rows/s':>10} {'baseline':>10} {'change':>8} {'peak MB':>9} {'baseline':>9} {'change':>8}")
+    for size, result in results["sizes"].items():
+        base = baseline["sizes"].get(size)
+        if not base:
+            print(f"{size:>8} (no baseline)")
+            continue
+        speed = result["rows_per_second"] / base["rows_per_second"] - 1
+        memory = result["peak_rss_mb"] / base["peak_rss_mb"] - 1
+        print(f"{size:>8} {result['rows_per_second']:>10.1f} {base['rows_per_second']:>10.1f} {speed:>+8.1%} "
+              f"{result['peak_rss_mb']:>9.1f} {base['peak_rss_mb']:>9.1f} {memory:>+8.1%}")
+        if speed < -tolerance:
+            regressions.append(f"{size} rows: throughput {speed:+.1%}")
+        if memory > tolerance:
+            regressions.append(f"{size} rows: peak memory {memory:+.1%}")
+    return regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.run_one:
+        return run_one(json.loads(args.run_one))
+
+    from fake_openai import FakeOpenAIServer
+
+    server = FakeOpenAIServer(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate, seed=args.seed
+    ).start()
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {
+            "seed": args.seed,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "error_rate": args.error_rate,
+            "max_workers": args.max_workers,
+            "batch_size": args.batch_size,
+        },
+        "sizes": {},
+    }
+    try:
+        for rows in args.sizes:
+            print(f"Benchmarking {rows} opportunities...")
+            result = run_size(args, server, rows)
+            results["sizes"][str(rows)] = result
+            stages = ", ".join(f"{name} {stage['seconds']:.2f}s" for name, stage in result["stages"].items())
+            print(f"  {result['rows_per_second']:.1f} rows/s, {result['seconds']:.1f}s, "
+                  f"peak {result['peak_rss_mb']:.0f} MB, LLM p95 {result['llm']['p95_seconds'] or 0:.3f}s")
+            print(f"  {stages}")
+    finally:
+        server.shutdown()
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['created'].replace(':', '')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results: {output}")
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save_baseline}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline: {path}")
+
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json"), encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["config"] != results["config"]:
+            print("Warning: baseline was recorded with a different configuration")
+        regressions = compare_results(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
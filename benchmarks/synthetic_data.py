@@ -0,0 +1,75 @@
+"""
+Deterministic synthetic opportunity and internal link CSVs for the benchmarks.
+"""
+import os
+import random
+
+import pandas as pd
+
+# Short topical vocabularies; the same seed always yields the same files
+VOCABULARY = {
+    'en': "casino poker bonus slots betting football odds guide review best online free sports live "
+          "tips jackpot roulette blackjack tournament strategy players welcome offer mobile app".split(),
+    'es': "casino apuestas futbol bono tragamonedas guia mejores deportes vivo consejos gratis ruleta "
+          "jugadores estrategia torneo movil aplicacion oferta bienvenida pronosticos cuotas".split(),
+    'fr': "casino paris football bonus machines guide meilleurs sports direct conseils gratuit roulette "
+          "joueurs strategie tournoi mobile application offre bienvenue pronostics cotes".split(),
+    'de': "kasino wetten fussball bonus spielautomaten ratgeber beste sport live tipps kostenlos roulette "
+          "spieler strategie turnier mobil anwendung angebot willkommen prognosen quoten".split(),
+    'it': "casino scommesse calcio bonus slot guida migliori sport diretta consigli gratis roulette "
+          "giocatori strategia torneo mobile applicazione offerta benvenuto pronostici quote".split(),
+    'pt': "cassino apostas futebol bonus caca niqueis guia melhores esportes vivo dicas gratis roleta "
+          "jogadores estrategia torneio celular aplicativo oferta boas vindas palpites odds".split(),
+}
+LANGUAGE_CODES = {'en': ['en', 'en-US', 'en-GB'], 'es': ['es'], 'fr': ['fr'], 'de': ['de'], 'it': ['it'], 'pt': ['pt-BR', 'pt']}
+DUPLICATE_RATE = 0.1
+
+
+def _phrase(rng, lang, words):
+    return " ".join(rng.sample(VOCABULARY[lang], words))
+
+
+def make_internal_links(rows, seed=0):
+    """Internal link pages: url, topic, lang"""
+    rng = random.Random(seed)
+    records = []
+    for i in range(rows):
+        lang = rng.choice(list(VOCABULARY))
+        records.append({
+            'url': f"https://www.example.com/{lang}/{'-'.join(rng.sample(VOCABULARY[lang], 2))}-{i}",
+            'topic': _phrase(rng, lang, rng.randint(4, 10)),
+            'lang': rng.choice(LANGUAGE_CODES[lang]),
+        })
+    return pd.DataFrame(records)
+
+
+def make_opportunities(rows, seed=0):
+    """Opportunity pages: url, keyword (about DUPLICATE_RATE of rows repeat an earlier one)"""
+    rng = random.Random(seed + 1)
+    records = []
+    for i in range(rows):
+        if records and rng.random() < DUPLICATE_RATE:
+            records.append(dict(rng.choice(records)))
+            continue
+        lang = rng.choice(list(VOCABULARY))
+        records.append({
+            'url': f"https://site{rng.randrange(500)}.example.org/{'/'.join(rng.sample(VOCABULARY[lang], 2))}-{i}",
+            'keyword': _phrase(rng, lang, rng.randint(2, 4)),
+        })
+    return pd.DataFrame(records)
+
+
+def ensure_dataset(data_dir, rows, link_rows=None, seed=0):
+    """
+    Write (or reuse) the CSV pair for one size, returning (opportunities_path, links_path).
+    Internal links default to a tenth of the opportunities, between 100 and 20,000 pages.
+    """
+    link_rows = link_rows or min(max(rows // 10, 100), 20_000)
+    os.makedirs(data_dir, exist_ok=True)
+    opportunities_path = os.path.join(data_dir, f"opportunities_{rows}_{seed}.csv")
+    links_path = os.path.join(data_dir, f"internal_links_{link_rows}_{seed}.csv")
+    if not os.path.exists(opportunities_path):
+        make_opportunities(rows, seed).to_csv(opportunities_path, index=False)
+    if not os.path.exists(links_path):
+        make_internal_links(link_rows, seed).to_csv(links_path, index=False)
+    return opportunities_path, links_path
@@ -0,0 +1,251 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.getenv("ANCHOR_CACHE_PATH", os.path.join(".anchor_cache", "anchors.sqlite3"))
+DEFAULT_MAX_ENTRIES = 200_000
+# Eviction runs every this many writes, so the cache may briefly exceed max_entries by this much
+EVICT_EVERY = 256
+
+
+def make_cache_key(model, prompt, temperature, lang_code):
+    """Stable hash of everything that determines a model reply"""
+    payload = json.dumps([model, prompt, temperature, lang_code], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _connect(path):
+    """
+    SQLite connection in autocommit mode shared by the caller's threads, with WAL so
+    readers never block the writer; the file's directory is created when missing
+    """
+    if path != ":memory:" and os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class AnchorCache:
+    """
+    Persistent SQLite cache of LLM anchor replies with LRU eviction and an optional TTL
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.lock = threading.Lock()
+
+        self.conn = _connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS anchors ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS anchors_accessed ON anchors (accessed)")
+
+    def get(self, key):
+        """Return the cached reply for key, or None when missing or expired"""
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT value, created FROM anchors WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl_seconds and now - row[1] > self.ttl_seconds):
+                if row is not None:
+                    self.conn.execute("DELETE FROM anchors WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE anchors SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, value):
+        """Store a reply and evict the least recently used entries beyond max_entries"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO anchors (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self.writes += 1
+            if self.writes % EVICT_EVERY == 0:
+                self._evict()
+
+    def _evict(self):
+        if self.max_entries:
+            self.conn.execute(
+                "DELETE FROM anchors WHERE key IN ("
+                " SELECT key FROM anchors ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        """Remove every cached entry and reset the counters"""
+        with self.lock:
+            self.conn.execute("DELETE FROM anchors")
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Entry count and hit/miss counters for this process"""
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM anchors").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+DEFAULT_STORE_PATH = os.getenv("OPPORTUNITY_STORE_PATH", os.path.join(".anchor_cache", "opportunities.sqlite3"))
+# Fingerprints looked up per query, below SQLite's bound-parameter limit
+LOOKUP_CHUNK = 500
+
+
+def make_fingerprints(urls, texts, index_version, settings, page_texts=None):
+    """
+    Fingerprint of each opportunity: its URL and anchor text together with the link index
+    version and the run settings its results depend on, and the fetched text of its page
+    when page_texts ({url: text}) is given
+    """
+    context = json.dumps([index_version, settings], ensure_ascii=False, sort_keys=True)
+    fingerprints = []
+    for url, text in zip(urls, texts):
+        parts = [context, str(url), str(text)]
+        if page_texts is not None:
+            parts.append(page_texts.get(url, ''))
+        fingerprints.append(hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest())
+    return fingerprints
+
+
+class FingerprintStore:
+    """
+    Persistent SQLite store of per-opportunity results keyed by fingerprint, so a rerun
+    only processes opportunities that are new or whose inputs or index changed
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+
+        self.conn = _connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " fingerprint TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " seen REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS results_seen ON results (seen)")
+
+    def get_many(self, fingerprints):
+        """Stored results for the known fingerprints, as {fingerprint: result}"""
+        fingerprints = list(dict.fromkeys(fingerprints))
+        now = time.time()
+        found = {}
+        with self.lock:
+            for start in range(0, len(fingerprints), LOOKUP_CHUNK):
+                chunk = fingerprints[start:start + LOOKUP_CHUNK]
+                marks = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT fingerprint, value FROM results WHERE fingerprint IN ({marks})", chunk
+                ).fetchall()
+                found.update((fingerprint, json.loads(value)) for fingerprint, value in rows)
+                self.conn.execute(f"UPDATE results SET seen = ? WHERE fingerprint IN ({marks})", [now, *chunk])
+        return found
+
+    def put_many(self, results):
+        """Store {fingerprint: result} in one transaction"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO results (fingerprint, value, seen) VALUES (?, ?, ?)",
+                [(fingerprint, json.dumps(result, ensure_ascii=False), now) for fingerprint, result in results.items()],
+            )
+            self.conn.execute("COMMIT")
+
+    def prune(self, older_than_seconds):
+        """Drop results no run has looked up or written for older_than_seconds"""
+        with self.lock:
+            return self.conn.execute(
+                "DELETE FROM results WHERE seen < ?", (time.time() - older_than_seconds,)
+            ).rowcount
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM results")
+
+    def stats(self):
+        with self.lock:
+            return {"entries": self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]}
+
+
+DEFAULT_PAGE_CACHE_PATH = os.getenv("PAGE_CACHE_PATH", os.path.join(".anchor_cache", "pages.sqlite3"))
+
+
+class PageCache:
+    """
+    Persistent SQLite store of fetched pages: extracted text plus the ETag and
+    Last-Modified validators used to revalidate them with a conditional GET
+    """
+
+    def __init__(self, path=DEFAULT_PAGE_CACHE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+
+        self.conn = _connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " text TEXT NOT NULL,"
+            " fetched REAL NOT NULL)"
+        )
+
+    def get_many(self, urls):
+        """Cached pages for the known URLs, as {url: {etag, last_modified, text, fetched}}"""
+        urls = list(dict.fromkeys(urls))
+        found = {}
+        with self.lock:
+            for start in range(0, len(urls), LOOKUP_CHUNK):
+                chunk = urls[start:start + LOOKUP_CHUNK]
+                marks = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT url, etag, last_modified, text, fetched FROM pages WHERE url IN ({marks})", chunk
+                ).fetchall()
+                found.update(
+                    (url, {"etag": etag, "last_modified": last_modified, "text": text, "fetched": fetched})
+                    for url, etag, last_modified, text, fetched in rows
+                )
+        return found
+
+    def put_many(self, pages):
+        """Store {url: {etag, last_modified, text}} in one transaction, stamped as fetched now"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, text, fetched) VALUES (?, ?, ?, ?, ?)",
+                [(url, page.get("etag"), page.get("last_modified"), page["text"], now) for url, page in pages.items()],
+            )
+            self.conn.execute("COMMIT")
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM pages")
+
+    def stats(self):
+        with self.lock:
+            return {"entries": self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]}
@@ -0,0 +1,242 @@
+"""
+Headless command-line entry point for large opportunity files.
+
+Example:
+    python cli.py opportunities.csv internal_links.csv \
+        --opp-url-col url --anchor-col keyword \
+        --stake-url-col url --stake-topic-col topic --stake-lang-col lang
+"""
+import argparse
+import functools
+import json
+import time
+
+import pandas as pd
+
+from anchor_utils import (
+    ANCHOR_INPUT_PRICE_PER_1K, ANCHOR_OUTPUT_PRICE_PER_1K, LINK_FEATURIZERS, iter_checkpointed_chunks,
+    match_links_and_generate_anchors, match_links_incrementally, open_checkpointed_job, prepare_link_index
+)
+from assignment_utils import DEFAULT_ASSIGNMENT_CANDIDATES, LinkAssigner
+from cache_utils import (
+    DEFAULT_CACHE_PATH, DEFAULT_PAGE_CACHE_PATH, DEFAULT_STORE_PATH, AnchorCache, FingerprintStore, PageCache
+)
+from export_utils import ResultWriter
+from fetch_utils import DEFAULT_FETCH_CONCURRENCY, DEFAULT_PER_HOST_CONCURRENCY, DEFAULT_FETCH_TIMEOUT, PageFetcher
+from job_utils import file_fingerprint
+from index_utils import DEFAULT_INDEX_DIR, DEFAULT_LSA_COMPONENTS
+from language_utils import MIN_LANGUAGE_CONFIDENCE
+from llm_utils import DEFAULT_MAX_WORKERS, RunBudget
+from metrics_utils import PipelineMetrics, profiled
+
+DEFAULT_CHUNK_SIZE = 10_000
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Match opportunities to internal links and suggest anchor texts, streaming results to CSV"
+    )
+    parser.add_argument("opportunities", help="Opportunities CSV (pages to link from)")
+    parser.add_argument("internal_links", help="Internal links CSV (pages to link to)")
+
+    columns = parser.add_argument_group("column mapping")
+    columns.add_argument("--opp-url-col", required=True, help="Opportunities column with the URLs to link from")
+    columns.add_argument("--anchor-col", required=True, help="Opportunities column with anchor text or target keywords")
+    columns.add_argument("--stake-url-col", required=True, help="Internal links column with page URLs")
+    columns.add_argument("--stake-topic-col", required=True, help="Internal links column describing each page")
+    columns.add_argument("--stake-lang-col", required=True, help="Internal links column with language codes")
+
+    output = parser.add_argument_group("output")
+    output.add_argument("--links-output", default="suggested_internal_links.csv",
+                        help="Written as CSV, Parquet (.parquet) or Arrow IPC (.arrow/.feather) by extension")
+    output.add_argument("--anchors-output", default="suggested_anchor_texts.csv",
+                        help="Written as CSV, Parquet (.parquet) or Arrow IPC (.arrow/.feather) by extension")
+    output.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Opportunities read, processed and written per chunk")
+    output.add_argument("--job-dir", default=None,
+                        help="Checkpoint finished chunks here; rerunning with the same inputs resumes after the last one")
+    output.add_argument("--metrics-output", default=None,
+                        help="Write per-stage timings, LLM latency/token usage and cache hit rates as JSON")
+    output.add_argument("--profile", default=None, metavar="PATH",
+                        help="Profile the run: cProfile stats for .prof, pyinstrument HTML for .html")
+
+    performance = parser.add_argument_group("performance")
+    performance.add_argument("--max-workers", type=int, default=DEFAULT_MAX_WORKERS,
+                             help="Concurrent OpenAI requests")
+    performance.add_argument("--requests-per-minute", type=int, default=None)
+    performance.add_argument("--tokens-per-minute", type=int, default=None)
+    performance.add_argument("--batch-size", type=int, default=1, help="Opportunities per prompt")
+    performance.add_argument("--min-language-confidence", type=float, default=MIN_LANGUAGE_CONFIDENCE)
+    performance.add_argument("--cache-path", default=DEFAULT_CACHE_PATH, help="Anchor cache SQLite file")
+    performance.add_argument("--no-cache", action="store_true", help="Always call the API")
+    performance.add_argument("--priority-col", default=None,
+                             help="Opportunities column ranking rows for the model within each chunk (default: similarity)")
+    performance.add_argument("--token-budget", type=int, default=None,
+                             help="Stop calling the model after this many tokens; later rows get keyword anchors. "
+                                  "The budget is spent chunk by chunk, so earlier chunks come first")
+    performance.add_argument("--cost-budget", type=float, default=None,
+                             help="Stop calling the model after this many USD at list prices")
+    performance.add_argument("--no-local-anchors", action="store_true",
+                             help="Send every opportunity to the model instead of building anchors locally when possible")
+    performance.add_argument("--index-dir", default=DEFAULT_INDEX_DIR,
+                             help="Directory of saved internal link indexes, shared with the app")
+    performance.add_argument("--no-index", action="store_true", help="Rebuild the link index in memory")
+    performance.add_argument("--featurizer", choices=LINK_FEATURIZERS, default="tfidf",
+                             help="tfidf: one fitted English vocabulary; hashing: per-language word and character n-grams")
+    performance.add_argument("--index-jobs", type=int, default=1,
+                             help="Processes featurizing internal links when building a hashing index")
+    performance.add_argument("--lsa-components", type=int, default=0,
+                             help=f"Match links in a dense LSA space of this many dimensions (e.g. {DEFAULT_LSA_COMPONENTS}); 0 keeps sparse matching")
+    performance.add_argument("--incremental", action="store_true",
+                             help="Only process opportunities that are new or changed since earlier runs")
+    performance.add_argument("--store-path", default=DEFAULT_STORE_PATH,
+                             help="Per-opportunity result store used by --incremental")
+
+    assignment = parser.add_argument_group("link assignment")
+    assignment.add_argument("--max-links-per-page", type=int, default=None,
+                            help="Assign links globally so no internal page gets more than this many")
+    assignment.add_argument("--max-links-per-source", type=int, default=None,
+                            help="Assign links globally so no opportunity page gets more than this many")
+    assignment.add_argument("--assignment-candidates", type=int, default=DEFAULT_ASSIGNMENT_CANDIDATES,
+                            help="Best internal pages per opportunity the assignment chooses from")
+
+    pages = parser.add_argument_group("page fetching")
+    pages.add_argument("--fetch-pages", action="store_true",
+                       help="Download each opportunity page and use its main text for matching and keywords")
+    pages.add_argument("--fetch-concurrency", type=int, default=DEFAULT_FETCH_CONCURRENCY,
+                       help="Page downloads in flight")
+    pages.add_argument("--per-host-concurrency", type=int, default=DEFAULT_PER_HOST_CONCURRENCY,
+                       help="Page downloads in flight per host")
+    pages.add_argument("--fetch-timeout", type=float, default=DEFAULT_FETCH_TIMEOUT, help="Seconds per page")
+    pages.add_argument("--page-cache-path", default=DEFAULT_PAGE_CACHE_PATH,
+                       help="SQLite file of fetched pages, revalidated with conditional GETs")
+    pages.add_argument("--no-page-cache", action="store_true", help="Download every page in full")
+    pages.add_argument("--page-max-age", type=float, default=None,
+                       help="Seconds a cached page is used without revalidating it")
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.profile:
+        return run(args)
+
+    profiler = "pyinstrument" if args.profile.endswith(".html") else "cprofile"
+    with profiled(profiler, args.profile):
+        run(args)
+    print(f"Profile: {args.profile}")
+
+
+def run(args):
+    started = time.monotonic()
+    metrics = PipelineMetrics()
+
+    # The internal links file is small and needed whole: load and index it once
+    internal_links_df = pd.read_csv(args.internal_links)
+    with metrics.stage("link_index"):
+        link_index = prepare_link_index(
+            internal_links_df, args.stake_topic_col, args.stake_url_col, args.stake_lang_col,
+            index_dir=None if args.no_index else args.index_dir,
+            featurizer=args.featurizer, n_jobs=args.index_jobs, lsa_components=args.lsa_components
+        )
+    cache = None if args.no_cache else AnchorCache(args.cache_path)
+    assigner = None
+    if args.max_links_per_page or args.max_links_per_source:
+        assigner = LinkAssigner(args.max_links_per_page, args.max_links_per_source, args.assignment_candidates)
+    fetcher = None
+    if args.fetch_pages:
+        fetcher = PageFetcher(
+            None if args.no_page_cache else PageCache(args.page_cache_path),
+            concurrency=args.fetch_concurrency, per_host_concurrency=args.per_host_concurrency,
+            timeout=args.fetch_timeout, max_age=args.page_max_age
+        )
+    budget = None
+    if args.token_budget or args.cost_budget:
+        budget = RunBudget(args.token_budget, args.cost_budget, ANCHOR_INPUT_PRICE_PER_1K, ANCHOR_OUTPUT_PRICE_PER_1K)
+
+    run_pipeline = match_links_and_generate_anchors
+    if args.incremental:
+        run_pipeline = functools.partial(match_links_incrementally, store=FingerprintStore(args.store_path))
+
+    options = dict(
+        anchor_col=args.anchor_col,
+        opp_url_col=args.opp_url_col,
+        stake_topic_col=args.stake_topic_col,
+        stake_url_col=args.stake_url_col,
+        stake_lang_col=args.stake_lang_col,
+        max_workers=args.max_workers,
+        requests_per_minute=args.requests_per_minute,
+        tokens_per_minute=args.tokens_per_minute,
+        cache=cache,
+        batch_size=args.batch_size,
+        min_language_confidence=args.min_language_confidence,
+        link_index=link_index,
+        metrics=metrics,
+        local_anchors=not args.no_local_anchors,
+        priority_col=args.priority_col,
+        budget=budget,
+        fetcher=fetcher,
+        assigner=assigner
+    )
+
+    def run_chunk(chunk, progress_callback=None):
+        return run_pipeline(chunk, internal_links_df, progress_callback=progress_callback, **options)
+
+    chunks = pd.read_csv(args.opportunities, chunksize=args.chunk_size)
+    if args.job_dir:
+        # Finished chunks are committed as they complete; after a restart they are copied
+        # from the checkpoints instead of being redone
+        job = open_checkpointed_job(
+            args.job_dir, file_fingerprint(args.opportunities), chunk_rows=args.chunk_size, pipeline=run_pipeline,
+            **options
+        )
+        results = iter_checkpointed_chunks(job, chunks, run_chunk, assigner, metrics=metrics)
+    else:
+        results = (run_chunk(chunk) for chunk in chunks)
+
+    processed = 0
+    with ResultWriter(args.links_output) as links_writer, ResultWriter(args.anchors_output) as anchors_writer:
+        for links_df, anchors_df in results:
+            # Stream each finished chunk to disk so memory stays bounded by the chunk size
+            with metrics.stage("write_output"):
+                links_writer.write(links_df)
+                anchors_writer.write(anchors_df)
+
+            processed += len(links_df)
+            print(f"Processed {processed} opportunities ({time.monotonic() - started:.1f}s)")
+
+    if cache:
+        stats = cache.stats()
+        print(f"Anchor cache: {stats['hits']} hits, {stats['misses']} misses")
+    if budget:
+        spent = budget.spent()
+        print(f"Budget: {spent['tokens']} tokens, ${spent['cost']:.2f} spent")
+    report = metrics.report()
+    local, llm = report["counters"].get("anchors_local", 0), report["counters"].get("anchors_llm", 0)
+    if local + llm:
+        print(f"Anchor tiers: {local / (local + llm):.0%} local, {llm / (local + llm):.0%} model")
+    if assigner:
+        assigned = assigner.report()
+        print(
+            f"Assignment: {assigned['reassigned']} links moved off their best page, {assigned['unassigned']} left unlinked by the caps, "
+            f"{assigned['no_candidates']} without any matching page, "
+            f"{assigned['similarity_given_up_share']:.1%} of total similarity given up; "
+            f"{assigned['pages_linked']} pages linked (argmax: {assigned['pages_linked_argmax']}), "
+            f"at most {assigned['max_links_per_page']} per page (argmax: {assigned['max_links_per_page_argmax']})"
+        )
+        report["assignment"] = assigned
+    if fetcher:
+        pages = {name[len("pages_"):]: count for name, count in report["counters"].items() if name.startswith("pages_")}
+        print("Pages: " + ", ".join(f"{count} {outcome.replace('_', ' ')}" for outcome, count in pages.items()))
+    for name, stage in report["stages"].items():
+        print(f"  {name}: {stage['seconds']:.2f}s over {stage['calls']} call(s)")
+    if args.metrics_output:
+        with open(args.metrics_output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Metrics: {args.metrics_output}")
+    print(f"Done: {args.links_output}, {args.anchors_output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import io
+import os
+
+# Output file extensions and the format written for each
+EXPORT_FORMATS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.ipc': 'arrow',
+}
+
+
+def export_format(path):
+    """Format for an output path, from its extension (CSV when unknown)"""
+    return EXPORT_FORMATS.get(os.path.splitext(str(path))[1].lower(), 'csv')
+
+
+def _to_table(df):
+    import pyarrow as pa
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def to_parquet_bytes(df):
+    """DataFrame as a Parquet file in memory; categorical columns stay dictionary encoded"""
+    import pyarrow.parquet as pq
+    buffer = io.BytesIO()
+    pq.write_table(_to_table(df), buffer, compression='zstd')
+    return buffer.getvalue()
+
+
+def to_arrow_bytes(df):
+    """DataFrame as an Arrow IPC (Feather v2) file in memory"""
+    import pyarrow as pa
+    buffer = io.BytesIO()
+    table = _to_table(df)
+    with pa.ipc.new_file(buffer, table.schema) as writer:
+        writer.write_table(table)
+    return buffer.getvalue()
+
+
+def _chunked_schema(table, format):
+    """
+    Schema every chunk is cast to, from the first chunk's table. Each chunk brings its own
+    categories: Parquet re-encodes dictionaries per row group, so only the index width is
+    fixed, while an Arrow IPC file cannot replace a dictionary mid-file, so categorical
+    columns are written as plain values. Columns (or categories) that are empty or all
+    missing in the first chunk carry no real type yet and are written as strings, like
+    the text the other result columns hold.
+    """
+    import pyarrow as pa
+    fields = []
+    for field, column in zip(table.schema, table.columns):
+        if pa.types.is_null(field.type):
+            field = field.with_type(pa.string())
+        elif pa.types.is_dictionary(field.type):
+            value_type = pa.string() if column.null_count == len(column) else field.type.value_type
+            if format == 'parquet':
+                field = field.with_type(pa.dictionary(pa.int32(), value_type))
+            else:
+                field = field.with_type(value_type)
+        fields.append(field)
+    return pa.schema(fields, metadata=table.schema.metadata)
+
+
+class ResultWriter:
+    """
+    Streams result DataFrames chunk by chunk to one CSV, Parquet or Arrow IPC file,
+    chosen by the path's extension
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.format = export_format(path)
+        self.writer = None
+        self.schema = None
+        self.started = False
+
+    def write(self, df):
+        if self.format == 'csv':
+            df.to_csv(self.path, mode='a' if self.started else 'w', header=not self.started, index=False)
+            self.started = True
+            return
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = _to_table(df)
+        if self.writer is None:
+            self.schema = _chunked_schema(table, self.format)
+            if self.format == 'parquet':
+                self.writer = pq.ParquetWriter(self.path, self.schema, compression='zstd')
+            else:
+                self.writer = pa.ipc.new_file(self.path, self.schema)
+        self.writer.write_table(table.cast(self.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        elif not self.started and self.format == 'csv':
+            open(self.path, 'w').close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import sparse
+
+# Hashed feature space shared by every language; memory never grows with the vocabulary
+DEFAULT_HASH_FEATURES = 1 << 20
+DEFAULT_WORD_NGRAMS = (1, 2)
+DEFAULT_CHAR_NGRAMS = (3, 5)
+# Texts featurized per task when transforming in parallel
+FEATURIZE_CHUNK_ROWS = 5000
+
+WORD_TOKEN = re.compile(r"(?u)\b\w\w+\b")
+
+
+class _LanguageAnalyzer:
+    """
+    Word and character n-grams of one language's text, with its stopwords removed first.
+    Word and character features are prefixed so the two never share a hash.
+    """
+
+    def __init__(self, stop_words, word_ngrams, char_ngrams):
+        self.stop_words = frozenset(stop_words)
+        self.word_ngrams = tuple(word_ngrams)
+        self.char_ngrams = tuple(char_ngrams)
+
+    def __call__(self, text):
+        tokens = [token for token in WORD_TOKEN.findall(text.lower()) if token not in self.stop_words]
+        features = []
+        low, high = self.word_ngrams
+        for size in range(low, high + 1):
+            features.extend("w:" + " ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1))
+        low, high = self.char_ngrams
+        for token in tokens:
+            padded = f" {token} "
+            for size in range(low, min(high, len(padded)) + 1):
+                features.extend("c:" + padded[i:i + size] for i in range(len(padded) - size + 1))
+        return features
+
+
+class HashingFeaturizer:
+    """
+    Stateless per-language featurizer: each text is analyzed with its own language's
+    stopwords into word and character n-grams that are hashed into one fixed-size space.
+    Nothing is fitted, so any chunk can be transformed on its own, in any order or process,
+    and memory stays fixed however large the vocabulary gets. Weighting is kept apart in
+    DocumentFrequencies.
+    """
+
+    def __init__(self, stop_words=None, n_features=DEFAULT_HASH_FEATURES,
+                 word_ngrams=DEFAULT_WORD_NGRAMS, char_ngrams=DEFAULT_CHAR_NGRAMS):
+        # stop_words maps a two-letter language prefix to its stopword list; other
+        # languages keep every word
+        self.stop_words = {prefix: sorted(words) for prefix, words in (stop_words or {}).items()}
+        self.n_features = n_features
+        self.word_ngrams = tuple(word_ngrams)
+        self.char_ngrams = tuple(char_ngrams)
+        self._vectorizers = {}
+
+    def get_params(self):
+        return {
+            'stop_words': self.stop_words,
+            'n_features': self.n_features,
+            'word_ngrams': list(self.word_ngrams),
+            'char_ngrams': list(self.char_ngrams),
+        }
+
+    def fingerprint(self):
+        """Hash of the settings; two featurizers with the same one produce the same features"""
+        payload = json.dumps(self.get_params(), ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def __getstate__(self):
+        # Vectorizers are rebuilt on demand, so only the settings travel to worker processes
+        return self.get_params()
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _vectorizer(self, prefix):
+        if prefix not in self._vectorizers:
+            from sklearn.feature_extraction.text import HashingVectorizer
+            analyzer = _LanguageAnalyzer(self.stop_words.get(prefix, ()), self.word_ngrams, self.char_ngrams)
+            self._vectorizers[prefix] = HashingVectorizer(
+                analyzer=analyzer, n_features=self.n_features, alternate_sign=False, norm=None
+            )
+        return self._vectorizers[prefix]
+
+    def transform(self, texts, langs):
+        """Raw term counts (texts x n_features CSR), each text analyzed in its own language"""
+        texts = [str(text) for text in texts]
+        prefixes = np.asarray([str(lang)[:2] for lang in langs], dtype=object)
+        if len(texts) == 0:
+            return sparse.csr_matrix((0, self.n_features), dtype=np.float64)
+
+        parts = []
+        order = []
+        for prefix in np.unique(prefixes):
+            positions = np.flatnonzero(prefixes == prefix)
+            parts.append(self._vectorizer(prefix).transform([texts[position] for position in positions]))
+            order.append(positions)
+        counts = sparse.vstack(parts, format='csr')
+        # Put the language groups back in input order
+        return counts[np.argsort(np.concatenate(order), kind='stable')]
+
+
+def _transform_chunk(featurizer, texts, langs):
+    return featurizer.transform(texts, langs)
+
+
+def transform_parallel(featurizer, texts, langs, n_jobs=1, chunk_rows=FEATURIZE_CHUNK_ROWS):
+    """featurizer.transform over chunks of texts in n_jobs worker processes"""
+    texts = list(texts)
+    langs = list(langs)
+    if n_jobs <= 1 or len(texts) <= chunk_rows:
+        return featurizer.transform(texts, langs)
+    starts = range(0, len(texts), chunk_rows)
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        parts = pool.map(
+            _transform_chunk,
+            [featurizer] * len(starts),
+            [texts[start:start + chunk_rows] for start in starts],
+            [langs[start:start + chunk_rows] for start in starts],
+        )
+        return sparse.vstack(list(parts), format='csr')
+
+
+class DocumentFrequencies:
+    """
+    IDF weighting for hashed features, maintained separately from the featurizer. Counts
+    can be added chunk by chunk, so the weights are learned while texts are streamed.
+    """
+
+    def __init__(self, n_features, df=None, n_documents=0):
+        self.n_features = n_features
+        self.df = np.zeros(n_features, dtype=np.int64) if df is None else np.asarray(df, dtype=np.int64)
+        self.n_documents = n_documents
+        self._idf = None
+
+    def update(self, counts):
+        """Add the documents of a counts matrix"""
+        counts = sparse.csr_matrix(counts)
+        counts.sum_duplicates()
+        self.df += np.bincount(counts.indices, minlength=self.n_features)
+        self.n_documents += counts.shape[0]
+        self._idf = None
+
+    def idf(self):
+        # Smoothed IDF, as TfidfVectorizer computes it
+        if self._idf is None:
+            self._idf = np.log((1 + self.n_documents) / (1 + self.df)) + 1.0
+        return self._idf
+
+    def weight(self, counts):
+        """L2-normalised TF-IDF rows for a counts matrix"""
+        from sklearn.preprocessing import normalize
+        weighted = sparse.csr_matrix(counts, dtype=np.float64, copy=True)
+        weighted.data *= self.idf()[weighted.indices]
+        return normalize(weighted, copy=False)
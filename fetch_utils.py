@@ -0,0 +1,219 @@
+import asyncio
+import re
+import time
+from collections import Counter
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+DEFAULT_FETCH_CONCURRENCY = 64
+DEFAULT_PER_HOST_CONCURRENCY = 4
+DEFAULT_FETCH_TIMEOUT = 15.0
+# Main text kept per page; the download stops once this much has been extracted
+PAGE_TEXT_CHARS = 3000
+# Bytes read per page at most, whatever the page looks like
+MAX_PAGE_BYTES = 2 << 20
+# Extracted pages waiting to be written to the page cache in one transaction
+CACHE_FLUSH_PAGES = 200
+USER_AGENT = "AnchorSuggester/1.0 (+internal link research)"
+
+WHITESPACE = re.compile(r"\s+")
+
+
+class MainTextExtractor(HTMLParser):
+    """
+    Streaming HTML-to-text extractor: feed it the page as it arrives and read text() at
+    any point. Scripts, styles and page chrome (navigation, header, footer, forms) are
+    dropped; text inside <main> or <article> is preferred when there is enough of it.
+    The title and meta description always lead.
+    """
+
+    SKIP_TAGS = frozenset([
+        'script', 'style', 'noscript', 'template', 'svg', 'iframe', 'nav', 'header', 'footer', 'aside',
+        'form', 'button', 'select',
+    ])
+    MAIN_TAGS = frozenset(['main', 'article'])
+    # Below this much text in <main>/<article>, the whole body is used instead
+    MIN_MAIN_CHARS = 200
+
+    def __init__(self, max_chars=PAGE_TEXT_CHARS):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.skip_depth = 0
+        self.main_depth = 0
+        self.in_title = False
+        self.title = []
+        self.description = ''
+        self.body = []
+        self.main = []
+        self.body_chars = 0
+        self.main_chars = 0
+
+    @property
+    def done(self):
+        """Enough text has been collected; the rest of the page can be skipped"""
+        return self.main_chars >= self.max_chars or (self.main_depth == 0 and self.body_chars >= 4 * self.max_chars)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in self.MAIN_TAGS:
+            self.main_depth += 1
+        elif tag == 'title':
+            self.in_title = True
+        elif tag == 'meta' and not self.description:
+            attrs = dict(attrs)
+            if (attrs.get('name') or attrs.get('property') or '').lower() in ('description', 'og:description'):
+                self.description = attrs.get('content') or ''
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self.skip_depth = max(self.skip_depth - 1, 0)
+        elif tag in self.MAIN_TAGS:
+            self.main_depth = max(self.main_depth - 1, 0)
+        elif tag == 'title':
+            self.in_title = False
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title.append(data)
+            return
+        if self.skip_depth or not data.strip():
+            return
+        self.body.append(data)
+        self.body_chars += len(data)
+        if self.main_depth:
+            self.main.append(data)
+            self.main_chars += len(data)
+
+    def text(self):
+        content = self.main if self.main_chars >= self.MIN_MAIN_CHARS else self.body
+        parts = [" ".join(self.title), self.description, " ".join(content)]
+        return WHITESPACE.sub(" ", " ".join(parts)).strip()[:self.max_chars]
+
+
+def extract_main_text(html, max_chars=PAGE_TEXT_CHARS):
+    """Main text of a complete HTML document"""
+    extractor = MainTextExtractor(max_chars)
+    extractor.feed(html)
+    extractor.close()
+    return extractor.text()
+
+
+def is_fetchable(url):
+    return isinstance(url, str) and urlsplit(url).scheme in ('http', 'https') and bool(urlsplit(url).netloc)
+
+
+class PageFetcher:
+    """
+    Concurrent page downloader for opportunity URLs. One pooled async HTTP client keeps up
+    to concurrency requests in flight, at most per_host_concurrency per host. With a
+    PageCache, known pages are revalidated with a conditional GET (ETag/Last-Modified)
+    and unchanged ones are served from the cache; pages fetched less than max_age seconds
+    ago are not requested at all. Failed fetches fall back to the cached text, or ''.
+    """
+
+    def __init__(self, cache=None, concurrency=DEFAULT_FETCH_CONCURRENCY,
+                 per_host_concurrency=DEFAULT_PER_HOST_CONCURRENCY, timeout=DEFAULT_FETCH_TIMEOUT,
+                 max_age=None, max_chars=PAGE_TEXT_CHARS):
+        self.cache = cache
+        self.concurrency = concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.timeout = timeout
+        self.max_age = max_age
+        self.max_chars = max_chars
+
+    def fetch(self, urls, metrics=None):
+        """{url: main text} for every distinct URL (blocking)"""
+        return asyncio.run(self.fetch_async(urls, metrics))
+
+    async def fetch_async(self, urls, metrics=None):
+        import httpx
+
+        urls = [url for url in dict.fromkeys(urls) if is_fetchable(url)]
+        cached = self.cache.get_many(urls) if self.cache else {}
+        texts = {}
+        outcomes = Counter()
+        if self.max_age:
+            fresh_after = time.time() - self.max_age
+            for url in urls:
+                if url in cached and cached[url]["fetched"] >= fresh_after:
+                    texts[url] = cached[url]["text"]
+                    outcomes["fresh"] += 1
+
+        pending = {}
+        slots = asyncio.Semaphore(self.concurrency)
+        host_slots = {}
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        timeout = httpx.Timeout(self.timeout, pool=None)
+        headers = {"User-Agent": USER_AGENT, "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.5"}
+
+        async def fetch_one(client, url):
+            host = urlsplit(url).netloc.lower()
+            host_slot = host_slots.setdefault(host, asyncio.Semaphore(self.per_host_concurrency))
+            # The host slot comes first so a request waiting on a busy host never holds one of
+            # the global slots that requests to other hosts could use
+            async with host_slot, slots:
+                outcome, page = await self._get(client, url, cached.get(url))
+            outcomes[outcome] += 1
+            if page is not None:
+                texts[url] = page["text"]
+                if self.cache and outcome in ("fetched", "not_modified"):
+                    pending[url] = page
+                    if len(pending) >= CACHE_FLUSH_PAGES:
+                        self._flush(pending)
+            else:
+                texts[url] = cached[url]["text"] if url in cached else ''
+
+        async with httpx.AsyncClient(
+                limits=limits, timeout=timeout, headers=headers, follow_redirects=True) as client:
+            await asyncio.gather(*(fetch_one(client, url) for url in urls if url not in texts))
+        self._flush(pending)
+
+        if metrics:
+            for outcome, count in outcomes.items():
+                metrics.count(f"pages_{outcome}", count)
+        return texts
+
+    def _flush(self, pending):
+        if pending:
+            self.cache.put_many(dict(pending))
+            pending.clear()
+
+    async def _get(self, client, url, cached):
+        """(outcome, page) for one URL; page is None when nothing usable was downloaded"""
+        import httpx
+
+        request_headers = {}
+        if cached:
+            if cached["etag"]:
+                request_headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                request_headers["If-Modified-Since"] = cached["last_modified"]
+        try:
+            async with client.stream("GET", url, headers=request_headers) as response:
+                if response.status_code == 304 and cached:
+                    return "not_modified", {
+                        "etag": response.headers.get("ETag") or cached["etag"],
+                        "last_modified": response.headers.get("Last-Modified") or cached["last_modified"],
+                        "text": cached["text"],
+                    }
+                if response.status_code != 200:
+                    return "failed", None
+                page = {
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "text": '',
+                }
+                if "html" not in response.headers.get("Content-Type", "text/html").lower():
+                    return "fetched", page
+
+                # Parse while downloading and stop reading once enough text is extracted
+                extractor = MainTextExtractor(self.max_chars)
+                async for chunk in response.aiter_text():
+                    extractor.feed(chunk)
+                    if extractor.done or response.num_bytes_downloaded >= MAX_PAGE_BYTES:
+                        break
+                page["text"] = extractor.text()
+                return "fetched", page
+        except (httpx.HTTPError, httpx.InvalidURL, UnicodeDecodeError):
+            return "failed", None
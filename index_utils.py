@@ -0,0 +1,586 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+from scipy import sparse
+
+from features_utils import DocumentFrequencies, HashingFeaturizer, transform_parallel
+
+# Opportunities scored per sparse product; memory grows with their candidate pages only
+MATCH_CHUNK_ROWS = 4096
+# Block key for "every internal link, whatever its language"
+ALL_LANGUAGES = '*'
+# Saved indexes live in one sub-directory per content hash, LATEST names the newest
+DEFAULT_INDEX_DIR = os.getenv("LINK_INDEX_DIR", ".link_index")
+LATEST_FILE = "LATEST"
+# Beyond this share of added/removed pages an update refits instead of patching
+MAX_UPDATE_FRACTION = 0.2
+# Below this share of the added pages' terms in the fitted vocabulary an update refits too
+MIN_UPDATE_VOCABULARY_COVERAGE = 0.5
+# Dimensions of the optional dense (LSA) projection
+DEFAULT_LSA_COMPONENTS = 256
+# Dense scores computed per matrix product (opportunities x pages), about 64 MB of float32
+DENSE_SCORE_CELLS = 1 << 24
+
+
+def link_content_hash(topics, urls, langs, max_features=1000, featurizer=None):
+    """
+    Content hash of the prepared internal links data that an index is built from
+    """
+    digest = hashlib.sha256(f"max_features={max_features}\n".encode("utf-8"))
+    if featurizer is not None:
+        digest.update(f"hashing={featurizer.fingerprint()}\n".encode("utf-8"))
+    for topic, url, lang in zip(topics, urls, langs):
+        digest.update(json.dumps([str(topic), str(url), str(lang)], ensure_ascii=False).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def build_link_index(topics, urls, langs, max_features=1000, featurizer=None, n_jobs=1, lsa_components=0):
+    """
+    Fit the TF-IDF matrix of internal links once and split it into per-language row blocks.
+
+    With a HashingFeaturizer, topics are instead featurized in their own language into a
+    fixed-size hashed space (in n_jobs processes) and weighted by document frequencies
+    counted alongside; max_features does not apply. With lsa_components, a dense LSA
+    projection of that many dimensions is fitted too (see add_lsa_projection).
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    topics = [str(topic) for topic in topics]
+    urls = list(urls)
+    langs = [str(lang) for lang in langs]
+    index = {
+        'topics': np.asarray(topics, dtype=object),
+        'urls': np.asarray(urls, dtype=object),
+        'langs': np.asarray(langs, dtype=object),
+        'max_features': max_features,
+        'content_hash': link_content_hash(topics, urls, langs, max_features, featurizer),
+        'vectorizer': None,
+        'frequencies': None,
+        'matrix': None,
+        'lsa': None,
+        'blocks': {},
+    }
+
+    if featurizer is not None:
+        counts = transform_parallel(featurizer, topics, langs, n_jobs=n_jobs)
+        frequencies = DocumentFrequencies(featurizer.n_features)
+        frequencies.update(counts)
+        index['matrix'] = frequencies.weight(counts)
+        index['vectorizer'] = featurizer
+        index['frequencies'] = frequencies
+    else:
+        vectorizer = TfidfVectorizer(max_features=max_features, stop_words='english')
+        try:
+            index['matrix'] = vectorizer.fit_transform(topics).tocsr()
+            index['vectorizer'] = vectorizer
+        except ValueError:
+            print("Warning: TF-IDF vectorizer fitting failed, using basic matching")
+
+    _split_language_blocks(index)
+    if lsa_components:
+        add_lsa_projection(index, lsa_components)
+    return index
+
+
+def _split_language_blocks(index):
+    # Language codes are matched on their two-letter prefix, so block on that once
+    index['blocks'] = {}
+    prefixes = np.asarray([lang[:2] for lang in index['langs']], dtype=object)
+    for prefix in np.unique(prefixes) if len(prefixes) else []:
+        _store_block(index, prefix, np.flatnonzero(prefixes == prefix))
+
+
+def _store_block(index, prefix, rows):
+    matrix = index['matrix']
+    index['blocks'][prefix] = {
+        'rows': rows,
+        'matrix': matrix[rows] if matrix is not None else None,
+    }
+    return index['blocks'][prefix]
+
+
+def get_language_block(index, lang_prefix):
+    """
+    Return the row block for a language prefix, falling back to every link when none match
+    """
+    if lang_prefix != ALL_LANGUAGES:
+        block = index['blocks'].get(lang_prefix)
+        if block is None:
+            # Unusual prefixes (e.g. a single letter) are resolved once and remembered
+            rows = np.flatnonzero([lang.startswith(lang_prefix) for lang in index['langs']])
+            block = _store_block(index, lang_prefix, rows)
+        if len(block['rows']):
+            return block
+    block = index['blocks'].get(ALL_LANGUAGES)
+    if block is None:
+        block = _store_block(index, ALL_LANGUAGES, np.arange(len(index['urls'])))
+    return block
+
+
+def match_declared_languages(index, texts, fallback='en'):
+    """
+    Declared language of the best-matching internal link over all languages, for texts
+    whose own language could not be detected confidently
+    """
+    if len(index['langs']) == 0:
+        return np.full(len(texts), fallback, dtype=object)
+    values, counts = np.unique(index['langs'], return_counts=True)
+    languages = np.full(len(texts), values[counts.argmax()], dtype=object)
+
+    rows, scores = match_links_batch(index, texts, [ALL_LANGUAGES] * len(texts))
+    matched = scores[:, 0] > 0
+    languages[matched] = index['langs'][rows[matched, 0]]
+    return languages
+
+
+def transform_texts(index, texts, langs):
+    """
+    L2-normalised feature rows of texts in the index's feature space; langs is only used
+    by hashed indexes, which analyze every text in its own language
+    """
+    vectorizer = index['vectorizer']
+    if index.get('frequencies') is not None:
+        return index['frequencies'].weight(vectorizer.transform(texts, langs))
+    return vectorizer.transform(list(texts)).tocsr()
+
+
+def add_lsa_projection(index, n_components=DEFAULT_LSA_COMPONENTS):
+    """
+    Fit a truncated SVD of the index's TF-IDF matrix and store the projection with the
+    index: contiguous float32 components for the feature columns in use and L2-normalised
+    page embeddings. match_links_batch then scores in this dense space, where pages with
+    related but different terms can still match.
+    """
+    from sklearn.decomposition import TruncatedSVD
+
+    matrix = index['matrix']
+    requested = n_components
+    index['lsa'] = None
+    if matrix is None:
+        return index
+    # Only columns that occur in some page carry weight, which keeps hashed indexes small
+    columns = np.unique(matrix.indices).astype(np.int64)
+    n_components = min(n_components, len(columns) - 1, matrix.shape[0] - 1)
+    if n_components < 1:
+        return index
+
+    used = sparse.csr_matrix(matrix[:, columns])
+    svd = TruncatedSVD(n_components=n_components, algorithm='randomized', random_state=0)
+    svd.fit(used)
+    components = np.ascontiguousarray(svd.components_.T, dtype=np.float32)
+    index['lsa'] = {
+        'n_components': requested,
+        'columns': columns,
+        'components': components,
+        'embeddings': _normalize_rows(np.asarray(used @ components, dtype=np.float32)),
+    }
+    for block in index['blocks'].values():
+        block.pop('embeddings', None)
+    return index
+
+
+def lsa_components_of(index):
+    """Dimensions requested for the index's LSA projection, 0 when it has none"""
+    return index['lsa']['n_components'] if index.get('lsa') else 0
+
+
+def _normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(vectors / norms, dtype=np.float32)
+
+
+def project_texts(index, texts, langs):
+    """L2-normalised float32 LSA embeddings of texts"""
+    lsa = index['lsa']
+    features = transform_texts(index, texts, langs)[:, lsa['columns']]
+    return _normalize_rows(np.asarray(features @ lsa['components'], dtype=np.float32))
+
+
+def _block_embeddings(index, block):
+    if 'embeddings' not in block:
+        block['embeddings'] = np.ascontiguousarray(index['lsa']['embeddings'][block['rows']])
+    return block['embeddings']
+
+
+def top_k_dense(scores, top_k):
+    """
+    Top_k column positions and scores per row of a dense score matrix, best first with
+    ties broken by position; argpartition keeps this linear in the number of columns
+    """
+    if top_k < scores.shape[1]:
+        candidates = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        # Where the k-th score is tied beyond the cut, argpartition picks arbitrarily
+        # among the tied columns; rank those few rows fully to keep the lowest positions
+        kth = np.take_along_axis(scores, candidates, axis=1).min(axis=1, keepdims=True)
+        tied = (scores == kth).sum(axis=1) > (np.take_along_axis(scores, candidates, axis=1) == kth).sum(axis=1)
+        for row in np.flatnonzero(tied):
+            candidates[row] = np.argsort(-scores[row], kind='stable')[:top_k]
+    else:
+        candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    values = np.take_along_axis(scores, candidates, axis=1)
+    order = np.lexsort((candidates, -values), axis=1)
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(values, order, axis=1)
+
+
+def _postings(block):
+    """
+    Inverted index of a language block: a term x page CSR matrix whose rows are the
+    weighted posting lists, built on first use
+    """
+    if 'postings' not in block:
+        block['postings'] = block['matrix'].T.tocsr()
+    return block['postings']
+
+
+def top_k_candidates(scores, top_k):
+    """
+    Top_k column positions and scores per row of a sparse score matrix, best first with
+    ties broken by position. Only stored (non-zero) candidates are ranked; rows with fewer
+    than top_k of them are padded with the lowest zero-score positions, exactly as a dense
+    argsort over every column would.
+    """
+    n_rows = scores.shape[0]
+    columns = np.full((n_rows, top_k), -1, dtype=np.int64)
+    values = np.zeros((n_rows, top_k), dtype=np.float64)
+
+    row_sizes = np.diff(scores.indptr)
+    row_ids = np.repeat(np.arange(n_rows), row_sizes)
+    order = np.lexsort((scores.indices, -scores.data, row_ids))
+    ranks = np.arange(len(order)) - scores.indptr[row_ids[order]]
+    in_top = ranks < top_k
+    kept = order[in_top]
+    columns[row_ids[kept], ranks[in_top]] = scores.indices[kept]
+    values[row_ids[kept], ranks[in_top]] = scores.data[kept]
+
+    n_columns = scores.shape[1]
+    for row in np.flatnonzero(row_sizes < top_k):
+        filled = min(row_sizes[row], top_k)
+        taken = set(columns[row, :filled].tolist())
+        padding = [column for column in range(min(n_columns, top_k + filled)) if column not in taken]
+        padding = padding[:min(top_k, n_columns) - filled]
+        columns[row, filled:filled + len(padding)] = padding
+    return columns, values
+
+
+def match_links_batch(index, texts, lang_prefixes, top_k=1):
+    """
+    Score all opportunity texts against their language block in one pass per language.
+
+    Candidates come from the block's inverted index, so only pages sharing at least one
+    term with an opportunity are scored; the best pages and scores are identical to a
+    cosine similarity against every page of the block.
+
+    Returns (rows, scores) arrays of shape (len(texts), top_k) holding positions into
+    the index arrays; slots that cannot be filled are -1 with a score of 0.
+    """
+    n_texts = len(texts)
+    best_rows = np.full((n_texts, top_k), -1, dtype=np.int64)
+    best_scores = np.zeros((n_texts, top_k), dtype=np.float64)
+    if n_texts == 0 or len(index['urls']) == 0:
+        return best_rows, best_scores
+
+    lang_prefixes = np.asarray(lang_prefixes, dtype=object)
+    if index.get('lsa') is not None:
+        return _match_links_dense(index, texts, lang_prefixes, top_k, best_rows, best_scores)
+    text_matrix = transform_texts(index, texts, lang_prefixes) if index['vectorizer'] else None
+
+    for prefix in np.unique(lang_prefixes):
+        positions = np.flatnonzero(lang_prefixes == prefix)
+        block = get_language_block(index, prefix)
+        rows = block['rows']
+        k = min(top_k, len(rows))
+
+        if text_matrix is None:
+            best_rows[positions, :k] = rows[:k]
+            continue
+
+        # TF-IDF rows are L2-normalised, so accumulating term weights along the posting
+        # lists gives the cosine similarity of every page that shares a term
+        postings = _postings(block)
+        for start in range(0, len(positions), MATCH_CHUNK_ROWS):
+            chunk = positions[start:start + MATCH_CHUNK_ROWS]
+            scores = (text_matrix[chunk] @ postings).tocsr()
+            scores.eliminate_zeros()
+            columns, values = top_k_candidates(scores, k)
+            best_rows[chunk, :k] = rows[columns]
+            best_scores[chunk, :k] = values
+
+    return best_rows, best_scores
+
+
+def _match_links_dense(index, texts, lang_prefixes, top_k, best_rows, best_scores):
+    # Cosine similarity in the LSA space: one float32 BLAS product per chunk of
+    # opportunities, sized so the score matrix stays within DENSE_SCORE_CELLS
+    embeddings = project_texts(index, texts, lang_prefixes)
+    for prefix in np.unique(lang_prefixes):
+        positions = np.flatnonzero(lang_prefixes == prefix)
+        block = get_language_block(index, prefix)
+        rows = block['rows']
+        k = min(top_k, len(rows))
+        if k == 0:
+            continue
+        pages = _block_embeddings(index, block)
+        chunk_rows = max(1, DENSE_SCORE_CELLS // len(rows))
+        for start in range(0, len(positions), chunk_rows):
+            chunk = positions[start:start + chunk_rows]
+            columns, values = top_k_dense(embeddings[chunk] @ pages.T, k)
+            best_rows[chunk, :k] = rows[columns]
+            best_scores[chunk, :k] = values
+    return best_rows, best_scores
+
+
+def _save_csr(directory, name, matrix):
+    np.save(os.path.join(directory, f"{name}_data.npy"), matrix.data)
+    np.save(os.path.join(directory, f"{name}_indices.npy"), matrix.indices)
+    np.save(os.path.join(directory, f"{name}_indptr.npy"), matrix.indptr)
+
+
+def _load_csr(directory, name, shape, mmap_mode):
+    parts = [np.load(os.path.join(directory, f"{name}_{part}.npy"), mmap_mode=mmap_mode)
+             for part in ("data", "indices", "indptr")]
+    return sparse.csr_matrix(tuple(parts), shape=shape, copy=False)
+
+
+def save_link_index(index, index_dir=DEFAULT_INDEX_DIR):
+    """
+    Save an index under index_dir/<content hash>: vocabulary and IDF, URL/topic/language
+    arrays and one memory-mappable CSR matrix per language block
+    """
+    directory = os.path.join(index_dir, index['content_hash'])
+    staging = directory + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    vectorizer = index['vectorizer']
+    frequencies = index.get('frequencies')
+    meta = {
+        'content_hash': index['content_hash'],
+        'max_features': index['max_features'],
+        'n_links': len(index['urls']),
+        'hashing': vectorizer.get_params() if frequencies is not None else None,
+        'n_documents': frequencies.n_documents if frequencies is not None else None,
+        'vocabulary': vectorizer.get_feature_names_out().tolist() if vectorizer and frequencies is None else None,
+        'urls': index['urls'].tolist(),
+        'topics': index['topics'].tolist(),
+        'langs': index['langs'].tolist(),
+        'blocks': [],
+    }
+    if frequencies is not None:
+        np.save(os.path.join(staging, "df.npy"), frequencies.df)
+        _save_csr(staging, "matrix", index['matrix'])
+    elif vectorizer:
+        np.save(os.path.join(staging, "idf.npy"), vectorizer.idf_)
+        _save_csr(staging, "matrix", index['matrix'])
+    lsa = index.get('lsa')
+    if lsa:
+        meta['lsa_components'] = lsa['n_components']
+        for name in ("columns", "components", "embeddings"):
+            np.save(os.path.join(staging, f"lsa_{name}.npy"), lsa[name])
+    for number, (prefix, block) in enumerate(index['blocks'].items()):
+        np.save(os.path.join(staging, f"block{number}_rows.npy"), block['rows'])
+        if block['matrix'] is not None:
+            _save_csr(staging, f"block{number}", block['matrix'])
+        meta['blocks'].append(prefix)
+    with open(os.path.join(staging, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    # Publish atomically so a concurrent reader never sees a half-written index
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(staging, directory)
+    with open(os.path.join(index_dir, LATEST_FILE + ".tmp"), "w") as f:
+        f.write(index['content_hash'])
+    os.replace(os.path.join(index_dir, LATEST_FILE + ".tmp"), os.path.join(index_dir, LATEST_FILE))
+    return directory
+
+
+def load_link_index(index_dir=DEFAULT_INDEX_DIR, content_hash=None, mmap_mode="r"):
+    """
+    Load a saved index (the latest one unless content_hash is given) with its matrices
+    memory-mapped; returns None when there is no such index
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    if content_hash is None:
+        try:
+            with open(os.path.join(index_dir, LATEST_FILE)) as f:
+                content_hash = f.read().strip()
+        except OSError:
+            return None
+    directory = os.path.join(index_dir, content_hash)
+    try:
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except OSError:
+        return None
+
+    index = {
+        'topics': np.asarray(meta['topics'], dtype=object),
+        'urls': np.asarray(meta['urls'], dtype=object),
+        'langs': np.asarray(meta['langs'], dtype=object),
+        'max_features': meta['max_features'],
+        'content_hash': meta['content_hash'],
+        'vectorizer': None,
+        'frequencies': None,
+        'matrix': None,
+        'lsa': None,
+        'blocks': {},
+    }
+    n_features = None
+    if meta.get('hashing') is not None:
+        # Nothing to rebuild for a hashed index but its settings and document frequencies
+        index['vectorizer'] = HashingFeaturizer(**meta['hashing'])
+        n_features = index['vectorizer'].n_features
+        index['frequencies'] = DocumentFrequencies(
+            n_features, np.load(os.path.join(directory, "df.npy")), meta['n_documents']
+        )
+        index['matrix'] = _load_csr(directory, "matrix", (meta['n_links'], n_features), mmap_mode)
+    elif meta['vocabulary'] is not None:
+        # Rebuild the fitted vectorizer from its vocabulary and IDF weights, no refit
+        vectorizer = TfidfVectorizer(stop_words='english', vocabulary=meta['vocabulary'])
+        vectorizer.idf_ = np.load(os.path.join(directory, "idf.npy"))
+        index['vectorizer'] = vectorizer
+        n_features = len(meta['vocabulary'])
+        index['matrix'] = _load_csr(directory, "matrix", (meta['n_links'], n_features), mmap_mode)
+    for number, prefix in enumerate(meta['blocks']):
+        rows = np.load(os.path.join(directory, f"block{number}_rows.npy"))
+        matrix = None
+        if index['vectorizer']:
+            matrix = _load_csr(directory, f"block{number}", (len(rows), n_features), mmap_mode)
+        index['blocks'][prefix] = {'rows': rows, 'matrix': matrix}
+    if meta.get('lsa_components'):
+        index['lsa'] = {'n_components': meta['lsa_components']}
+        for name in ("columns", "components", "embeddings"):
+            index['lsa'][name] = np.load(os.path.join(directory, f"lsa_{name}.npy"), mmap_mode=mmap_mode)
+    return index
+
+
+def update_link_index(index, topics, urls, langs):
+    """
+    Apply added, removed and changed pages to an index without refitting the vocabulary
+    or IDF: unchanged rows are reused and only new rows are transformed. Falls back to a
+    full rebuild when too much has changed for the old IDF weights to stay representative,
+    or when the fitted vocabulary misses too much of the added pages (see
+    _covered_by_vocabulary), so a patched index never matches worse than a fresh build.
+    """
+    topics = [str(topic) for topic in topics]
+    urls = list(urls)
+    langs = [str(lang) for lang in langs]
+    max_features = index['max_features']
+    featurizer = index['vectorizer'] if index.get('frequencies') is not None else None
+
+    # Pages are identified by their (url, topic, language); a changed page is a removal
+    # plus an addition. Duplicate rows are matched one to one.
+    old_rows = {}
+    for row, key in enumerate(zip(index['urls'], index['topics'], index['langs'])):
+        old_rows.setdefault(key, []).append(row)
+    source_rows = []
+    new_positions = []
+    for position, key in enumerate(zip(urls, topics, langs)):
+        candidates = old_rows.get(key)
+        if candidates:
+            source_rows.append(candidates.pop(0))
+        else:
+            source_rows.append(-1)
+            new_positions.append(position)
+    removed = sum(len(rows) for rows in old_rows.values())
+
+    changed = len(new_positions) + removed
+    if (index['vectorizer'] is None or changed > MAX_UPDATE_FRACTION * max(len(urls), 1) or
+            not _covered_by_vocabulary(index, [topics[position] for position in new_positions])):
+        return build_link_index(topics, urls, langs, max_features, featurizer, lsa_components=lsa_components_of(index))
+
+    source_rows = np.asarray(source_rows, dtype=np.int64)
+    matrix = index['matrix']
+    if new_positions:
+        added = transform_texts(
+            index, [topics[position] for position in new_positions], [langs[position] for position in new_positions]
+        )
+        source_rows[new_positions] = matrix.shape[0] + np.arange(len(new_positions))
+        matrix = sparse.vstack([matrix, added], format='csr')
+
+    updated = {
+        'topics': np.asarray(topics, dtype=object),
+        'urls': np.asarray(urls, dtype=object),
+        'langs': np.asarray(langs, dtype=object),
+        'max_features': max_features,
+        'content_hash': link_content_hash(topics, urls, langs, max_features, featurizer),
+        'vectorizer': index['vectorizer'],
+        'frequencies': index.get('frequencies'),
+        'matrix': matrix[source_rows].tocsr(),
+        'lsa': None,
+        'blocks': {},
+    }
+    _split_language_blocks(updated)
+    lsa = index.get('lsa')
+    if lsa:
+        # Fold the pages into the existing projection, like the frozen IDF weights
+        projected = updated['matrix'][:, np.asarray(lsa['columns'])] @ lsa['components']
+        updated['lsa'] = {**lsa, 'embeddings': _normalize_rows(np.asarray(projected, dtype=np.float32))}
+    print(f"Link index updated: {len(new_positions)} added, {removed} removed")
+    return updated
+
+
+def _covered_by_vocabulary(index, texts):
+    """
+    Whether a fitted TF-IDF vocabulary represents texts well enough to patch them in:
+    every text with terms keeps at least one of them, and at least
+    MIN_UPDATE_VOCABULARY_COVERAGE of all their terms are known. Hashed features have no
+    vocabulary to miss.
+    """
+    if index.get('frequencies') is not None:
+        return True
+    vectorizer = index['vectorizer']
+    vocabulary = getattr(vectorizer, 'vocabulary_', None) or vectorizer.vocabulary
+    analyzer = vectorizer.build_analyzer()
+    known = total = 0
+    for text in texts:
+        terms = analyzer(text)
+        text_known = sum(term in vocabulary for term in terms)
+        if terms and not text_known:
+            return False
+        known += text_known
+        total += len(terms)
+    return known >= MIN_UPDATE_VOCABULARY_COVERAGE * total
+
+
+def _same_featurization(index, max_features, featurizer):
+    if featurizer is None:
+        return index.get('frequencies') is None and index['max_features'] == max_features
+    return index.get('frequencies') is not None and index['vectorizer'].fingerprint() == featurizer.fingerprint()
+
+
+def load_or_build_link_index(topics, urls, langs, index_dir=DEFAULT_INDEX_DIR, max_features=1000,
+                             featurizer=None, n_jobs=1, lsa_components=0):
+    """
+    Return the saved index for this exact internal links data if there is one; otherwise
+    patch the latest saved index (or build from scratch) and save the result. A saved
+    index without the requested LSA projection gets one fitted and saved.
+    """
+    topics = [str(topic) for topic in topics]
+    urls = list(urls)
+    langs = [str(lang) for lang in langs]
+    content_hash = link_content_hash(topics, urls, langs, max_features, featurizer)
+
+    index = load_link_index(index_dir, content_hash)
+    if index is not None and (lsa_components_of(index) == lsa_components or not lsa_components):
+        index['lsa'] = index['lsa'] if lsa_components else None
+        return index
+
+    if index is None:
+        latest = load_link_index(index_dir)
+        if latest is not None and _same_featurization(latest, max_features, featurizer):
+            index = update_link_index(latest, topics, urls, langs)
+        else:
+            index = build_link_index(topics, urls, langs, max_features, featurizer, n_jobs)
+    if lsa_components_of(index) != lsa_components:
+        if lsa_components:
+            add_lsa_projection(index, lsa_components)
+        else:
+            index['lsa'] = None
+    save_link_index(index, index_dir)
+    return index
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from export_utils import ResultWriter
+
+DEFAULT_JOB_DIR = os.getenv("ANCHOR_JOB_DIR", ".anchor_jobs")
+DEFAULT_JOB_CHUNK_ROWS = 2_000
+MANIFEST_FILE = "manifest.json"
+# Columns turned back into categoricals when chunks are combined
+CATEGORICAL_COLUMNS = ("Detected Language", "Source")
+
+
+def job_fingerprint(*parts):
+    """Stable hash of everything that identifies a job (inputs, index version, settings)"""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def frame_fingerprint(df, columns):
+    """Content hash of some columns of a DataFrame"""
+    hashes = pd.util.hash_pandas_object(df[list(columns)], index=False)
+    return hashlib.sha256(hashes.to_numpy().tobytes()).hexdigest()
+
+
+def file_fingerprint(path, block_size=1 << 20):
+    """Content hash of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, write):
+    # Keep the extension so writers that pick a format by it still see the real one
+    root, extension = os.path.splitext(path)
+    temporary = f"{root}.tmp{extension}"
+    write(temporary)
+    os.replace(temporary, path)
+
+
+class CheckpointedJob:
+    """
+    Durable, resumable run: results are committed chunk by chunk as Parquet files next to
+    a small JSON manifest. A chunk's files are renamed into place before the manifest lists
+    them, so after a crash every chunk in the manifest is complete and is never redone.
+    """
+
+    def __init__(self, job_dir, fingerprint, total_rows=None):
+        self.job_dir = job_dir
+        self.manifest_path = os.path.join(job_dir, MANIFEST_FILE)
+        os.makedirs(job_dir, exist_ok=True)
+
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+            if self.manifest["fingerprint"] != fingerprint:
+                raise ValueError(
+                    f"{job_dir} holds checkpoints of a different job; use another job directory or delete it"
+                )
+        else:
+            self.manifest = {"fingerprint": fingerprint, "total_rows": total_rows, "chunks": {}, "finished": False}
+            self._save_manifest()
+
+    @property
+    def completed_rows(self):
+        return sum(chunk["rows"] for chunk in self.manifest["chunks"].values())
+
+    @property
+    def total_rows(self):
+        return self.manifest["total_rows"]
+
+    @property
+    def finished(self):
+        return self.manifest["finished"]
+
+    def is_committed(self, chunk_number):
+        return str(chunk_number) in self.manifest["chunks"]
+
+    def _save_manifest(self):
+        def write(path):
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.manifest, f, indent=2)
+        _write_atomic(self.manifest_path, write)
+
+    def commit(self, chunk_number, rows, links_df, anchors_df):
+        """Durably store one finished chunk and record it in the manifest"""
+        files = {}
+        for name, df in (("links", links_df), ("anchors", anchors_df)):
+            files[name] = f"{name}_{chunk_number:06d}.parquet"
+
+            def write(path, df=df):
+                with ResultWriter(path) as writer:
+                    writer.write(df)
+            _write_atomic(os.path.join(self.job_dir, files[name]), write)
+
+        self.manifest["chunks"][str(chunk_number)] = {"rows": rows, **files}
+        self._save_manifest()
+
+    def finish(self, total_rows=None):
+        """Mark the job complete (and record its size when it was not known up front)"""
+        if total_rows is not None:
+            self.manifest["total_rows"] = total_rows
+        self.manifest["finished"] = True
+        self._save_manifest()
+
+    def load_chunk(self, chunk_number):
+        """(links_df, anchors_df) of one committed chunk"""
+        chunk = self.manifest["chunks"][str(chunk_number)]
+        return (
+            pd.read_parquet(os.path.join(self.job_dir, chunk["links"])),
+            pd.read_parquet(os.path.join(self.job_dir, chunk["anchors"])),
+        )
+
+    def iter_chunks(self):
+        """(links_df, anchors_df) of every committed chunk, in chunk order"""
+        for chunk_number in sorted(self.manifest["chunks"], key=int):
+            yield self.load_chunk(chunk_number)
+
+    def combined_results(self):
+        """All committed results as one links and one anchors DataFrame"""
+        links, anchors = [], []
+        for links_df, anchors_df in self.iter_chunks():
+            links.append(links_df)
+            anchors.append(anchors_df)
+        combined = []
+        for frames in (links, anchors):
+            df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+            for column in CATEGORICAL_COLUMNS:
+                if column in df:
+                    df[column] = df[column].astype("category")
+            combined.append(df)
+        return combined[0], combined[1]
@@ -0,0 +1,127 @@
+import json
+import os
+import re
+
+import numpy as np
+
+# Below this posterior probability a detection is treated as a guess
+MIN_LANGUAGE_CONFIDENCE = 0.8
+# Texts shorter than this carry too little signal to classify
+MIN_TEXT_LENGTH = 10
+# Probability mass added to every n-gram, as langdetect does (alpha 0.5 / base frequency 10000)
+PROFILE_SMOOTHING = 0.5 / 10000
+
+NON_LETTERS = re.compile(r"[\W\d_]+")
+
+_profile_model = None
+
+
+def _normalize(text):
+    return NON_LETTERS.sub(" ", text.lower())
+
+
+def default_profile_dir():
+    """Language profiles bundled with langdetect"""
+    import langdetect
+    return os.path.join(os.path.dirname(langdetect.__file__), 'profiles')
+
+
+def build_profile_model(profile_dir=None, languages=None):
+    """
+    Build a character n-gram naive Bayes model from the langdetect language profiles.
+    Returns the language codes, a CountVectorizer with the shared n-gram vocabulary and
+    a (vocabulary x languages) matrix of log probabilities.
+    """
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    profile_dir = profile_dir or default_profile_dir()
+    profiles = {}
+    for name in sorted(os.listdir(profile_dir)):
+        if languages and name not in languages:
+            continue
+        with open(os.path.join(profile_dir, name), encoding='utf-8') as f:
+            profile = json.load(f)
+        # Fold case so URLs and lowercase anchors score like running text
+        freq = {}
+        for gram, count in profile['freq'].items():
+            gram = gram.lower()
+            if len(gram) > 3:
+                continue
+            freq[gram] = freq.get(gram, 0) + count
+        profiles[profile['name']] = (freq, profile['n_words'])
+
+    codes = list(profiles)
+    vocabulary = sorted({gram for freq, _ in profiles.values() for gram in freq if gram.strip()})
+    gram_ids = {gram: i for i, gram in enumerate(vocabulary)}
+    gram_sizes = np.array([len(gram) for gram in vocabulary])
+
+    log_probs = np.empty((len(vocabulary), len(codes)), dtype=np.float32)
+    for column, code in enumerate(codes):
+        freq, n_words = profiles[code]
+        counts = np.zeros(len(vocabulary), dtype=np.float64)
+        for gram, count in freq.items():
+            if gram in gram_ids:
+                counts[gram_ids[gram]] = count
+        totals = np.asarray(n_words, dtype=np.float64)[gram_sizes - 1]
+        log_probs[:, column] = np.log(counts / totals + PROFILE_SMOOTHING)
+
+    vectorizer = CountVectorizer(
+        analyzer='char_wb',
+        ngram_range=(1, 3),
+        lowercase=False,
+        preprocessor=_normalize,
+        vocabulary=gram_ids,
+        dtype=np.float32,
+    )
+    return {'codes': np.asarray(codes, dtype=object), 'vectorizer': vectorizer, 'log_probs': log_probs}
+
+
+def get_profile_model():
+    """Build the profile model on first use and keep it for the process"""
+    global _profile_model
+    if _profile_model is None:
+        _profile_model = build_profile_model()
+    return _profile_model
+
+
+def detect_languages_batch(texts, fallback='en', model=None):
+    """
+    Classify a whole column of texts at once.
+
+    Returns (codes, confidences): the most likely language per text and its posterior
+    probability. Texts too short to classify get the fallback with confidence 0.
+    """
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    model = model or get_profile_model()
+    texts = ["" if text is None else str(text) for text in texts]
+    codes = np.full(len(texts), fallback, dtype=object)
+    confidences = np.zeros(len(texts), dtype=np.float64)
+    if not texts:
+        return codes, confidences
+
+    # Character n-grams never cross word boundaries, so score each distinct word once
+    # and sum word scores per text with one sparse product
+    word_vectorizer = CountVectorizer(
+        preprocessor=_normalize, tokenizer=str.split, token_pattern=None,
+        lowercase=False, dtype=np.float32
+    )
+    try:
+        word_counts = word_vectorizer.fit_transform(texts)
+    except ValueError:
+        # No text contains a single word
+        return codes, confidences
+    word_grams = model['vectorizer'].transform(word_vectorizer.get_feature_names_out())
+    word_scores = np.asarray(word_grams @ model['log_probs'], dtype=np.float64)
+    scores = np.asarray(word_counts @ word_scores)
+    known_grams = word_counts @ (word_grams.getnnz(axis=1) > 0).astype(np.float32)
+
+    scores -= scores.max(axis=1, keepdims=True)
+    posteriors = np.exp(scores)
+    posteriors /= posteriors.sum(axis=1, keepdims=True)
+
+    best = posteriors.argmax(axis=1)
+    usable = np.array([len(text.strip()) >= MIN_TEXT_LENGTH for text in texts]) & (known_grams > 0)
+    codes[usable] = model['codes'][best[usable]]
+    confidences[usable] = posteriors[usable, best[usable]]
+    return codes, confidences
@@ -0,0 +1,202 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_MAX_RETRIES = 5
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Shared OpenAI client, created on first use so importing never needs an API key
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import openai
+                _client = openai.OpenAI()
+    return _client
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that refills continuously up to a per-minute capacity
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.available = float(per_minute)
+        self.refill_rate = float(per_minute) / 60.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+    def reserve(self, amount):
+        """Take amount from the bucket, returning how long to wait before it is covered"""
+        amount = min(float(amount), self.capacity)
+        with self.lock:
+            self._refill()
+            self.available -= amount
+            if self.available >= 0:
+                return 0.0
+            return -self.available / self.refill_rate
+
+
+class RateLimiter:
+    """
+    Enforces requests-per-minute and tokens-per-minute budgets across worker threads
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def acquire(self, tokens=0):
+        """Block until one request carrying the given number of tokens may be sent"""
+        wait = 0.0
+        if self.requests:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens and tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        if wait > 0:
+            time.sleep(wait)
+
+
+class BudgetExceeded(Exception):
+    """Raised instead of sending a request the run budget can no longer cover"""
+
+
+class RunBudget:
+    """
+    Thread-safe token and/or dollar ceiling for one run. Each request reserves its worst
+    case (prompt plus max completion tokens) up front, so concurrent requests can never
+    overshoot, and settles to the reported usage once it returns.
+    """
+
+    def __init__(self, max_tokens=None, max_cost=None, input_price_per_1k=0.0, output_price_per_1k=0.0):
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.input_price = input_price_per_1k / 1000
+        self.output_price = output_price_per_1k / 1000
+        self.tokens = 0
+        self.cost = 0.0
+        self.lock = threading.Lock()
+
+    def _cost(self, prompt_tokens, completion_tokens):
+        return prompt_tokens * self.input_price + completion_tokens * self.output_price
+
+    def reserve(self, prompt_tokens, max_completion_tokens):
+        """Reserve a request's worst case, raising BudgetExceeded if it does not fit"""
+        tokens = prompt_tokens + max_completion_tokens
+        cost = self._cost(prompt_tokens, max_completion_tokens)
+        with self.lock:
+            if self.max_tokens is not None and self.tokens + tokens > self.max_tokens:
+                raise BudgetExceeded(f"token budget of {self.max_tokens} reached")
+            if self.max_cost is not None and self.cost + cost > self.max_cost:
+                raise BudgetExceeded(f"cost budget of ${self.max_cost:.2f} reached")
+            self.tokens += tokens
+            self.cost += cost
+        return tokens, cost
+
+    def settle(self, reservation, usage=None):
+        """Replace a reservation by the actual usage (or release it when usage is None)"""
+        tokens, cost = reservation
+        prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+        completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+        with self.lock:
+            self.tokens += prompt_tokens + completion_tokens - tokens
+            self.cost += self._cost(prompt_tokens, completion_tokens) - cost
+
+    def spent(self):
+        with self.lock:
+            return {"tokens": self.tokens, "cost": self.cost}
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(model):
+    """tiktoken encoding for a model, or None when tiktoken or its data is unavailable"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # The encoding files are fetched on first use and may be unreachable offline
+        return None
+
+
+def count_tokens(text, model):
+    """Exact token count with the model's tokenizer, or about four characters per token"""
+    encoding = get_tokenizer(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text, max_tokens, model):
+    """Cut text to at most max_tokens tokens of the model's tokenizer"""
+    encoding = get_tokenizer(model)
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def is_retryable_error(error):
+    """Rate limits, server errors, timeouts and dropped connections are worth retrying"""
+    import openai
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+def call_with_retries(func, max_retries=DEFAULT_MAX_RETRIES, base_delay=1.0, max_delay=30.0):
+    """
+    Call func, retrying retryable OpenAI errors with full-jitter exponential backoff
+    """
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable_error(e):
+                raise
+            time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+            attempt += 1
+
+
+def run_concurrently(jobs, worker, max_workers=DEFAULT_MAX_WORKERS, progress_callback=None):
+    """
+    Run worker(job) for every job with at most max_workers in flight, keeping input order
+    """
+    jobs = list(jobs)
+    results = [None] * len(jobs)
+    total = len(jobs)
+    if not jobs:
+        return results
+
+    with ThreadPoolExecutor(max_workers=max(1, int(max_workers))) as executor:
+        futures = {executor.submit(worker, job): position for position, job in enumerate(jobs)}
+        for completed, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if progress_callback:
+                progress_callback(completed, total)
+
+    return results
@@ -0,0 +1,127 @@
+import io
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class PipelineMetrics:
+    """
+    Thread-safe collector of per-stage wall time, LLM latency and token usage, and cache
+    hit rates for one pipeline run. Long-lived users (the suggestion service) pass
+    max_samples to compute latency percentiles over the most recent calls only.
+    """
+
+    def __init__(self, max_samples=None):
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.llm_latencies = deque(maxlen=max_samples)
+        self.llm_errors = 0
+        self.tokens = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as one call of a pipeline stage"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage_time(name, time.perf_counter() - started)
+
+    def add_stage_time(self, name, seconds, calls=1):
+        with self.lock:
+            stage = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+            stage["seconds"] += seconds
+            stage["calls"] += calls
+
+    def record_llm_call(self, seconds, usage=None, failed=False):
+        """Record one chat completion (including its retries) and its token usage"""
+        with self.lock:
+            self.llm_latencies.append(seconds)
+            if failed:
+                self.llm_errors += 1
+            for field in self.tokens:
+                self.tokens[field] += getattr(usage, field, 0) or 0
+
+    def record_cache(self, hit):
+        with self.lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+    def count(self, name, amount=1):
+        """Increment a free-form counter (e.g. unique rows, batch re-splits)"""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def report(self):
+        """Plain dict of everything recorded so far, ready for JSON"""
+        with self.lock:
+            latencies = np.fromiter(self.llm_latencies, dtype=np.float64, count=len(self.llm_latencies))
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "llm": {
+                    "calls": int(len(latencies)),
+                    "errors": self.llm_errors,
+                    "p50_seconds": float(np.percentile(latencies, 50)) if len(latencies) else None,
+                    "p95_seconds": float(np.percentile(latencies, 95)) if len(latencies) else None,
+                    "total_seconds": float(latencies.sum()),
+                    **self.tokens,
+                },
+                "cache": {
+                    "hits": self.cache_hits,
+                    "misses": self.cache_misses,
+                    "hit_rate": self.cache_hits / lookups if lookups else 0.0,
+                },
+                "counters": dict(self.counters),
+            }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.report(), **kwargs)
+
+
+@contextmanager
+def profiled(profiler="cprofile", output_path=None):
+    """
+    Profile the enclosed block for a deep dive. profiler is "cprofile" or "pyinstrument"
+    (if installed). Yields a dict that receives the text report as "report" on exit;
+    output_path additionally saves .prof stats (cProfile) or an HTML report (pyinstrument).
+    """
+    profile = {}
+    if profiler == "pyinstrument":
+        from pyinstrument import Profiler
+
+        session = Profiler()
+        session.start()
+        try:
+            yield profile
+        finally:
+            session.stop()
+            profile["report"] = session.output_text()
+            if output_path:
+                with open(output_path, "w", encoding="utf-8") as f:
+                    f.write(session.output_html())
+        return
+
+    import cProfile
+    import pstats
+
+    session = cProfile.Profile()
+    session.enable()
+    try:
+        yield profile
+    finally:
+        session.disable()
+        stream = io.StringIO()
+        pstats.Stats(session, stream=stream).sort_stats("cumulative").print_stats(40)
+        profile["report"] = stream.getvalue()
+        if output_path:
+            session.dump_stats(output_path)
@@ -0,0 +1,58 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Everything but word characters and whitespace is dropped when normalizing text
+CLEAN_TEXT_PATTERN = re.compile(r"[^\w\s]")
+
+
+def clean_text_series(texts):
+    """Vectorized clean_text: lowercase and strip punctuation, missing values become ''"""
+    texts = pd.Series(texts, copy=False)
+    return texts.fillna('').astype(str).str.lower().str.replace(CLEAN_TEXT_PATTERN, '', regex=True)
+
+
+def _read_only(values):
+    values = np.asarray(values, dtype=object)
+    values.flags.writeable = False
+    return values
+
+
+def prepare_opportunities(opportunities_df, opp_url_col, anchor_col, page_texts=None):
+    """
+    Project the two opportunity columns the pipeline needs into read-only arrays, leaving
+    the caller's DataFrame untouched: the raw URLs, the anchor texts as strings, the
+    "url anchor" text used for language and keyword detection and its cleaned form.
+    With page_texts ({url: fetched page text}), each page's text is appended to the
+    latter two.
+    """
+    urls = opportunities_df[opp_url_col]
+    anchors = opportunities_df[anchor_col]
+    url_strings = urls.astype(object).map(str)
+    anchor_strings = anchors.astype(object).map(str)
+    full_texts = url_strings + " " + anchor_strings
+    match_texts = urls.fillna('').astype(str) + " " + anchors.fillna('').astype(str)
+    if page_texts:
+        pages = urls.map(page_texts).fillna('').astype(str)
+        full_texts = (full_texts + " " + pages).str.rstrip()
+        match_texts = match_texts + " " + pages
+    return {
+        'urls': _read_only(urls.to_numpy(dtype=object)),
+        'texts': _read_only(anchor_strings.to_numpy()),
+        'full_texts': _read_only(full_texts.to_numpy()),
+        'clean_texts': _read_only(clean_text_series(match_texts).to_numpy(dtype=object)),
+    }
+
+
+def prepare_internal_links(internal_links_df, stake_topic_col, stake_url_col, stake_lang_col):
+    """
+    New compact frame of the internal links data the index is built from: cleaned topic,
+    url and a categorical language code (missing ones default to 'en'). The caller's
+    DataFrame is never modified, so one upload can be prepared any number of times.
+    """
+    return pd.DataFrame({
+        'topic': clean_text_series(internal_links_df[stake_topic_col]),
+        'url': internal_links_df[stake_url_col],
+        'lang': internal_links_df[stake_lang_col].fillna('en').astype(str).astype('category'),
+    })
@@ -0,0 +1,388 @@
+"""
+Long-running HTTP suggestion service for editors: the internal link index stays warm in
+memory and concurrent requests are grouped into micro-batches.
+
+Example:
+    python service.py internal_links.csv \
+        --stake-url-col url --stake-topic-col topic --stake-lang-col lang --port 8080
+
+    curl -s localhost:8080/suggest -d '{"url": "https://example.com/post", "text": "best slots bonus"}'
+
+Endpoints:
+    POST /suggest   {"url", "text", "lang" (optional), "top_k" (default 1), "anchors" (default true)}
+    GET  /health    index size and version
+    GET  /metrics   request latency percentiles, batch sizes, stage timings, LLM and cache stats
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from anchor_utils import (
+    LINK_FEATURIZERS, LOCAL_ANCHOR_MIN_CANDIDATES, LOCAL_ANCHOR_MIN_SIMILARITY, clean_text, extract_keywords_batch,
+    fit_keyword_idf, generate_anchor_batch, get_stopwords, local_anchor_candidates, lookup_job_anchors, prepare_link_index
+)
+from cache_utils import DEFAULT_CACHE_PATH, AnchorCache
+from index_utils import DEFAULT_INDEX_DIR, DEFAULT_LSA_COMPONENTS, match_declared_languages, match_links_batch
+from language_utils import MIN_LANGUAGE_CONFIDENCE, detect_languages_batch, get_profile_model
+from llm_utils import DEFAULT_MAX_RETRIES, DEFAULT_MAX_WORKERS, RateLimiter
+from metrics_utils import PipelineMetrics
+
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_WAIT_MS = 5.0
+MAX_TOP_K = 20
+# Latency percentiles are computed over this many most recent requests
+LATENCY_WINDOW = 10_000
+
+
+class MicroBatcher:
+    """
+    Collects items submitted from many threads and hands them to process_batch(items) in
+    batches of up to max_batch_size, waiting at most max_wait_ms after the first item.
+    process_batch returns one result per item; submit returns a Future for it. With
+    concurrency > 1, that many batches may be processed at once (for I/O-bound work).
+    """
+
+    def __init__(self, process_batch, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS,
+                 concurrency=1, name="batcher"):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+        self.batch_sizes = deque(maxlen=LATENCY_WINDOW)
+        self.executor = ThreadPoolExecutor(concurrency, thread_name_prefix=name) if concurrency > 1 else None
+        threading.Thread(target=self._run, name=name, daemon=True).start()
+
+    def submit(self, item):
+        future = Future()
+        self.queue.put((item, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self.batch_sizes.append(len(batch))
+            if self.executor:
+                self.executor.submit(self._process, batch)
+            else:
+                self._process(batch)
+
+    def _process(self, batch):
+        try:
+            results = self.process_batch([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+class SuggestionService:
+    """
+    Warm link index plus two micro-batchers: one for language detection, keywords and
+    link matching, and one packing anchor_batch_size model jobs per prompt with up to
+    max_workers prompts in flight, so slow model calls never hold up matching. Requests
+    whose match yields enough local anchor candidates skip the model.
+    """
+
+    def __init__(self, link_index, cache=None, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS, max_workers=DEFAULT_MAX_WORKERS, requests_per_minute=None,
+                 tokens_per_minute=None, anchor_batch_size=1, local_anchors=True,
+                 min_language_confidence=MIN_LANGUAGE_CONFIDENCE):
+        self.link_index = link_index
+        self.cache = cache
+        # Keywords are weighted by the internal links' IDF rather than by whatever other
+        # requests share a micro-batch, so a request always gets the same keywords
+        self.keyword_idf = fit_keyword_idf(link_index['topics'], link_index['langs'])
+        # One limiter for the life of the service, so the budgets hold across batches
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.local_anchors = local_anchors
+        self.min_language_confidence = min_language_confidence
+        self.metrics = PipelineMetrics(max_samples=LATENCY_WINDOW)
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.match_latencies = deque(maxlen=LATENCY_WINDOW)
+        self.request_latencies = deque(maxlen=LATENCY_WINDOW)
+        self.errors = 0
+
+        self.matcher = MicroBatcher(self.match_batch, max_batch_size, max_wait_ms, name="match-batcher")
+        self.anchorer = MicroBatcher(
+            self.anchor_batch, max(1, anchor_batch_size), max_wait_ms, concurrency=max_workers, name="anchor-batcher"
+        )
+
+    def warm_up(self):
+        """Load the language model, stopwords and vectorizer code paths before the first request"""
+        get_profile_model()
+        for lang in set(self.link_index['langs']) | {'en'}:
+            get_stopwords(lang[:2])
+        self.match_batch([{"url": "https://example.com/warm-up", "text": "warm up request text", "top_k": 1}])
+
+    def match_batch(self, items):
+        """Language, keywords and best links for a micro-batch of requests"""
+        full_texts = [f"{item.get('url', '')} {item.get('text', '')}" for item in items]
+        clean_texts = [clean_text(text) for text in full_texts]
+
+        # Only requests without a declared language are classified
+        langs = [str(item['lang']) if item.get('lang') else None for item in items]
+        undeclared = [position for position, lang in enumerate(langs) if lang is None]
+        if undeclared:
+            with self.metrics.stage('language_detection'):
+                detected, confidences = detect_languages_batch([full_texts[i] for i in undeclared])
+                uncertain = np.flatnonzero(confidences < self.min_language_confidence)
+                if len(uncertain):
+                    detected[uncertain] = match_declared_languages(
+                        self.link_index, [clean_texts[undeclared[i]] for i in uncertain]
+                    )
+                for position, lang in zip(undeclared, detected):
+                    langs[position] = lang
+
+        with self.metrics.stage('keyword_extraction'):
+            keywords_per_item = extract_keywords_batch(full_texts, langs, idf=self.keyword_idf)
+
+        top_k = max(item['top_k'] for item in items)
+        with self.metrics.stage('similarity'):
+            rows, scores = match_links_batch(
+                self.link_index, clean_texts, [lang[:2] if lang else 'en' for lang in langs], top_k=top_k
+            )
+
+        results = []
+        for position, item in enumerate(items):
+            links = [
+                {"url": self.link_index['urls'][row], "topic": self.link_index['topics'][row],
+                 "score": round(float(score), 3)}
+                for row, score in zip(rows[position, :item['top_k']], scores[position, :item['top_k']])
+                if row >= 0
+            ]
+            results.append({
+                "language": langs[position],
+                "keywords": keywords_per_item[position][:5],
+                "links": links,
+                "_job": (full_texts[position], str(item.get('text', '')), keywords_per_item[position], langs[position]),
+            })
+        self.metrics.count('requests_matched', len(items))
+        return results
+
+    def anchor_batch(self, jobs):
+        """Anchors for a micro-batch of jobs: cached ones are reused, the rest share one prompt"""
+        results = [lookup_job_anchors(self.cache, job, self.metrics) if self.cache else None for job in jobs]
+        misses = [position for position, anchors in enumerate(results) if anchors is None]
+        if misses:
+            self.metrics.count('anchors_llm', len(misses))
+            with self.metrics.stage('anchor_generation'):
+                generated = generate_anchor_batch(
+                    [jobs[position] for position in misses], self.rate_limiter, DEFAULT_MAX_RETRIES, self.cache,
+                    self.metrics
+                )
+            for position, anchors in zip(misses, generated):
+                results[position] = anchors
+        return results
+
+    def local_anchors_for(self, job, best):
+        """Local anchor candidates when the best match is strong and yields enough of them"""
+        if not self.local_anchors or best is None or best['score'] < LOCAL_ANCHOR_MIN_SIMILARITY:
+            return None
+        candidates = local_anchor_candidates(*job, topic=best['topic'])
+        return candidates if len(candidates) >= LOCAL_ANCHOR_MIN_CANDIDATES else None
+
+    def suggest(self, request):
+        """Handle one /suggest request body, blocking until its micro-batches are done"""
+        started = time.perf_counter()
+        item = {
+            "url": str(request.get("url") or ""),
+            "text": str(request.get("text") or ""),
+            "lang": request.get("lang"),
+            "top_k": min(max(int(request.get("top_k", 1)), 1), MAX_TOP_K),
+        }
+        matched = self.matcher.submit(item).result()
+        match_seconds = time.perf_counter() - started
+
+        job = matched.pop("_job")
+        response = dict(matched, match_ms=round(match_seconds * 1000, 2))
+        if request.get("anchors", True):
+            anchors = self.local_anchors_for(job, matched["links"][0] if matched["links"] else None)
+            if anchors:
+                self.metrics.count('anchors_local')
+                response["anchors"], response["source"] = anchors, "Keywords + Topic"
+            else:
+                response["anchors"], response["source"] = self.anchorer.submit(job).result(), "AI + Keywords"
+
+        with self.lock:
+            self.match_latencies.append(match_seconds)
+            self.request_latencies.append(time.perf_counter() - started)
+        return response
+
+    def health(self):
+        return {
+            "status": "ok",
+            "links": int(len(self.link_index['urls'])),
+            "index_version": self.link_index['content_hash'],
+            "uptime_seconds": round(time.time() - self.started, 1),
+        }
+
+    def report(self):
+        """Latency percentiles over the recent window plus the pipeline metrics"""
+        with self.lock:
+            match = np.fromiter(self.match_latencies, dtype=np.float64, count=len(self.match_latencies))
+            total = np.fromiter(self.request_latencies, dtype=np.float64, count=len(self.request_latencies))
+            errors = self.errors
+
+        def percentiles(values):
+            if not len(values):
+                return {"count": 0, "p50_ms": None, "p95_ms": None, "p99_ms": None}
+            p50, p95, p99 = np.percentile(values, [50, 95, 99]) * 1000
+            return {"count": int(len(values)), "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99)}
+
+        sizes = list(self.matcher.batch_sizes)
+        return {
+            "match_latency": percentiles(match),
+            "request_latency": percentiles(total),
+            "errors": errors,
+            "mean_match_batch_size": float(np.mean(sizes)) if sizes else None,
+            **self.metrics.report(),
+        }
+
+
+class SuggestionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body):
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == "/health":
+            return self.send_json(200, self.server.service.health())
+        if self.path == "/metrics":
+            return self.send_json(200, self.server.service.report())
+        self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/suggest":
+            return self.send_json(404, {"error": "not found"})
+        service = self.server.service
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(request, dict) or not (request.get("url") or request.get("text")):
+                return self.send_json(400, {"error": "expected a JSON object with url and/or text"})
+            self.send_json(200, service.suggest(request))
+        except (ValueError, TypeError) as e:
+            self.send_json(400, {"error": str(e)})
+        except Exception as e:
+            with service.lock:
+                service.errors += 1
+            print(f"Suggestion error: {e}")
+            self.send_json(500, {"error": "internal error"})
+
+
+class SuggestionServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Editors' requests arrive in bursts; the default listen backlog of 5 drops connections
+    request_queue_size = 256
+
+    def __init__(self, service, host="127.0.0.1", port=8080):
+        super().__init__((host, port), SuggestionHandler)
+        self.service = service
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve internal link and anchor suggestions over HTTP")
+    parser.add_argument("internal_links", help="Internal links CSV (pages to link to)")
+
+    columns = parser.add_argument_group("column mapping")
+    columns.add_argument("--stake-url-col", required=True, help="Internal links column with page URLs")
+    columns.add_argument("--stake-topic-col", required=True, help="Internal links column describing each page")
+    columns.add_argument("--stake-lang-col", required=True, help="Internal links column with language codes")
+
+    server = parser.add_argument_group("server")
+    server.add_argument("--host", default="127.0.0.1")
+    server.add_argument("--port", type=int, default=8080)
+    server.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                        help="Requests scored together per micro-batch")
+    server.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help="How long a micro-batch waits for more requests after the first")
+
+    performance = parser.add_argument_group("performance")
+    performance.add_argument("--max-workers", type=int, default=DEFAULT_MAX_WORKERS,
+                             help="Concurrent OpenAI requests")
+    performance.add_argument("--requests-per-minute", type=int, default=None)
+    performance.add_argument("--tokens-per-minute", type=int, default=None)
+    performance.add_argument("--batch-size", type=int, default=1, help="Opportunities per prompt")
+    performance.add_argument("--min-language-confidence", type=float, default=MIN_LANGUAGE_CONFIDENCE)
+    performance.add_argument("--cache-path", default=DEFAULT_CACHE_PATH, help="Anchor cache SQLite file")
+    performance.add_argument("--no-cache", action="store_true", help="Always call the API")
+    performance.add_argument("--index-dir", default=DEFAULT_INDEX_DIR,
+                             help="Directory of saved internal link indexes, shared with the app")
+    performance.add_argument("--no-index", action="store_true", help="Rebuild the link index in memory")
+    performance.add_argument("--featurizer", choices=LINK_FEATURIZERS, default="tfidf",
+                             help="tfidf: one fitted English vocabulary; hashing: per-language word and character n-grams")
+    performance.add_argument("--index-jobs", type=int, default=1,
+                             help="Processes featurizing internal links when building a hashing index")
+    performance.add_argument("--lsa-components", type=int, default=0,
+                             help=f"Match links in a dense LSA space of this many dimensions (e.g. {DEFAULT_LSA_COMPONENTS}); 0 keeps sparse matching")
+    performance.add_argument("--no-local-anchors", action="store_true",
+                             help="Send every request to the model instead of building anchors locally when possible")
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    internal_links_df = pd.read_csv(args.internal_links)
+    link_index = prepare_link_index(
+        internal_links_df, args.stake_topic_col, args.stake_url_col, args.stake_lang_col,
+        index_dir=None if args.no_index else args.index_dir,
+        featurizer=args.featurizer, n_jobs=args.index_jobs, lsa_components=args.lsa_components
+    )
+    service = SuggestionService(
+        link_index,
+        cache=None if args.no_cache else AnchorCache(args.cache_path),
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        max_workers=args.max_workers,
+        requests_per_minute=args.requests_per_minute,
+        tokens_per_minute=args.tokens_per_minute,
+        anchor_batch_size=args.batch_size,
+        local_anchors=not args.no_local_anchors,
+        min_language_confidence=args.min_language_confidence,
+    )
+    service.warm_up()
+
+    server = SuggestionServer(service, args.host, args.port)
+    print(f"Serving suggestions for {len(link_index['urls'])} internal links on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
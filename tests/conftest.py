@@ -0,0 +1,48 @@
+import json
+import os
+import re
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# The modules live at the repository root rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import anchor_utils
+from anchor_utils import ANCHOR_MODEL
+from llm_utils import count_tokens
+
+
+class FakeCompletions:
+    """Chat completions answering anchor prompts, single or batched, with fixed anchors"""
+
+    def __init__(self, fail_keywords=()):
+        self.fail_keywords = set(fail_keywords)
+        self.prompts = []
+
+    def create(self, model, messages, temperature, max_tokens):
+        prompt = messages[0]["content"]
+        self.prompts.append(prompt)
+        batch = re.search(r"Opportunities:\s*(\[.*\])\s*Requirements", prompt, re.S)
+        if batch:
+            items = json.loads(batch.group(1))
+            keywords = [item["main_keyword"] for item in items]
+            content = json.dumps({item["id"]: [f"{item['main_keyword']} guide"] for item in items})
+        else:
+            keywords = [re.search(r"Main keyword: (.*)", prompt).group(1).strip()]
+            content = f"{keywords[0]} guide, best {keywords[0]}"
+        if self.fail_keywords.intersection(keywords):
+            raise ValueError("model unavailable")
+        # Report the worst case as usage so budgets are spent predictably
+        usage = SimpleNamespace(prompt_tokens=count_tokens(prompt, ANCHOR_MODEL), completion_tokens=max_tokens)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    completions = FakeCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    client.with_options = lambda **options: client
+    monkeypatch.setattr(anchor_utils, "get_client", lambda: client)
+    return completions
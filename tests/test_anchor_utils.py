@@ -0,0 +1,95 @@
+import json
+import re
+
+import pandas as pd
+
+from anchor_utils import (
+    ANCHOR_MAX_TOKENS, ANCHOR_MODEL, FALLBACK_ANCHOR_SOURCE, _generate_anchor_batch, build_anchor_prompt,
+    lookup_cached_anchors, match_links_and_generate_anchors, match_links_incrementally, store_cached_anchors
+)
+from cache_utils import AnchorCache, FingerprintStore
+from llm_utils import RunBudget, count_tokens
+from metrics_utils import PipelineMetrics
+
+
+def test_cached_anchors_keep_commas():
+    cache = AnchorCache(":memory:")
+    store_cached_anchors(cache, "key", ["slots, bonus", "poker tips"])
+    assert lookup_cached_anchors(cache, "key") == ["slots, bonus", "poker tips"]
+    # Entries from before the JSON format hold the comma-separated reply
+    cache.set("legacy", 'best slots, "poker tips"')
+    assert lookup_cached_anchors(cache, "legacy") == ["best slots", "poker tips"]
+    assert lookup_cached_anchors(cache, "missing") is None
+
+
+def test_batch_over_budget_is_split_before_falling_back(fake_model):
+    jobs = [(f"https://example.com/{n} text about topic {n}", f"topic {n}", ["alpha", "beta"], "en") for n in range(4)]
+    single_cost = [count_tokens(build_anchor_prompt(*job), ANCHOR_MODEL) + ANCHOR_MAX_TOKENS for job in jobs]
+    budget = RunBudget(max_tokens=single_cost[0] + single_cost[1] + 5)
+
+    results = _generate_anchor_batch(jobs, budget=budget)
+    assert [final for _, final in results] == [True, True, False, False]
+    assert results[0][0][0] == "topic 0 guide"
+
+
+def test_incremental_run_reuses_stored_rows_and_retries_fallbacks(fake_model):
+    internal_links = pd.DataFrame({
+        "url": ["https://example.com/slots", "https://example.com/poker"],
+        "topic": ["online slots bonus", "poker tournament strategy"],
+        "lang": ["en", "en"],
+    })
+    opportunities = pd.DataFrame({
+        "page": ["https://blog.example.org/slots-news", "https://blog.example.org/poker-night",
+                 "https://blog.example.org/outage"],
+        "anchor": ["slots bonus", "poker strategy", "broken anchor"],
+    })
+    store = FingerprintStore(":memory:")
+    fake_model.fail_keywords = {"broken anchor"}
+
+    def run(df):
+        return match_links_incrementally(
+            df, internal_links, "anchor", "page", "topic", "url", "lang", store, local_anchors=False
+        )
+
+    links, anchors = run(opportunities)
+    sources = dict(zip(anchors["Original Anchor"], anchors["Source"].astype(str)))
+    assert sources["slots bonus"] == "AI + Keywords"
+    assert sources["broken anchor"] == FALLBACK_ANCHOR_SOURCE
+    stored = [json.loads(value) for value, in store.conn.execute("SELECT value FROM results")]
+    assert sorted(record["source"] for record in stored) == ["AI + Keywords", "AI + Keywords"]
+
+    # Unchanged rows come from the store; the fallback row and the changed row are redone
+    prompts = len(fake_model.prompts)
+    changed = opportunities.assign(anchor=["slots bonus", "poker tournaments", "broken anchor"])
+    links_again, anchors_again = run(changed)
+    asked = [re.search(r"Main keyword: (.*)", prompt).group(1).strip() for prompt in fake_model.prompts[prompts:]]
+    assert sorted(asked) == ["broken anchor", "poker tournaments"]
+    assert links_again["Suggested Internal Link"].tolist()[0] == links["Suggested Internal Link"].tolist()[0]
+    reused = anchors_again[anchors_again["Original Anchor"] == "slots bonus"]
+    assert reused["Suggested Anchor Text"].tolist() == anchors[anchors["Original Anchor"] == "slots bonus"][
+        "Suggested Anchor Text"].tolist()
+
+
+def test_progress_counts_rows_that_need_no_model_reply(fake_model):
+    internal_links = pd.DataFrame({
+        "url": ["https://example.com/slots", "https://example.com/poker"],
+        "topic": ["online slots bonus", "poker tournament strategy"],
+        "lang": ["en", "en"],
+    })
+    opportunities = pd.DataFrame({
+        "page": ["https://blog.example.org/online-slots-bonus", "https://blog.example.org/night",
+                 "https://blog.example.org/poker-tournament-strategy"],
+        "anchor": ["online slots bonus", "tomato seedlings", "poker tournament strategy"],
+    })
+    progress = []
+    metrics = PipelineMetrics()
+    match_links_and_generate_anchors(
+        opportunities, internal_links, "anchor", "page", "topic", "url", "lang",
+        progress_callback=lambda done, total: progress.append((done, total)), metrics=metrics
+    )
+    counters = metrics.report()["counters"]
+    assert counters["anchors_local"] > 0 and counters["anchors_llm"] > 0
+    # Rows built locally are done before any model reply, and the total covers every row
+    assert progress[0] == (counters["anchors_local"], 3)
+    assert progress[-1] == (3, 3)
+    assert len(fake_model.prompts) == counters["anchors_llm"]
@@ -0,0 +1,67 @@
+from assignment_utils import LinkAssigner
+
+
+def test_page_cap_moves_the_weaker_row_to_its_next_candidate():
+    assigner = LinkAssigner(max_links_per_page=1)
+    chosen = assigner.assign(['s1', 's2'], [['p1', 'p2'], ['p1', 'p3']], [[0.9, 0.5], [0.8, 0.4]])
+    assert chosen.tolist() == [0, 1]
+    assert assigner.page_links == {'p1': 1, 'p3': 1}
+
+
+def test_source_cap_leaves_rows_unassigned():
+    assigner = LinkAssigner(max_links_per_source=1)
+    chosen = assigner.assign(['s1', 's1'], [['p1', None], ['p2', None]], [[0.9, 0.0], [0.8, 0.0]])
+    assert chosen.tolist() == [0, -1]
+    assert assigner.report()['unassigned'] == 1
+
+
+def test_caps_hold_across_calls():
+    assigner = LinkAssigner(max_links_per_page=1)
+    assert assigner.assign(['s1'], [['p1', 'p2']], [[0.9, 0.2]]).tolist() == [0]
+    assert assigner.assign(['s2'], [['p1', 'p2']], [[0.9, 0.2]]).tolist() == [1]
+
+
+def test_reserved_links_count_against_the_caps():
+    assigner = LinkAssigner(max_links_per_page=1)
+    assigner.reserve(['s0', 's0'], ['p1', None])
+    assert assigner.assign(['s1'], [['p1', 'p2']], [[0.9, 0.2]]).tolist() == [1]
+    # Reserving the same pair twice is still one link
+    assigner.reserve(['s0'], ['p1'])
+    assert assigner.page_links['p1'] == 1
+
+
+def test_duplicate_pairs_share_one_link_within_a_call():
+    assigner = LinkAssigner(max_links_per_page=1)
+    chosen = assigner.assign(['s1', 's1'], [['p1', 'p2'], ['p1', 'p2']], [[0.9, 0.2], [0.9, 0.2]])
+    assert chosen.tolist() == [0, 0]
+    assert assigner.page_links['p1'] == 1
+    assert assigner.source_links['s1'] == 1
+
+
+def test_duplicate_pairs_share_one_link_across_calls():
+    assigner = LinkAssigner(max_links_per_page=1, max_links_per_source=1)
+    assert assigner.assign(['s1'], [['p1', 'p2']], [[0.9, 0.2]]).tolist() == [0]
+    assert assigner.assign(['s1'], [['p1', 'p2']], [[0.9, 0.2]]).tolist() == [0]
+    assert assigner.page_links == {'p1': 1}
+    assert assigner.source_links == {'s1': 1}
+    assert assigner.report()['reassigned'] == 0
+
+
+def test_report_compares_with_the_independent_argmax():
+    assigner = LinkAssigner(max_links_per_page=1)
+    assigner.assign(
+        ['s1', 's2', 's3'], [['p1', 'p2'], ['p1', 'p3'], [None, None]], [[0.9, 0.5], [0.8, 0.4], [0.0, 0.0]],
+        weights=[1, 2, 1]
+    )
+    report = assigner.report()
+    assert report['links'] == 4
+    assert report['reassigned'] == 2
+    assert report['unassigned'] == 0
+    assert report['no_candidates'] == 1
+    assert report['argmax_similarity'] == 2.5
+    assert report['assigned_similarity'] == 1.7
+    assert report['similarity_given_up'] == 0.8
+    assert report['pages_linked'] == 2
+    assert report['pages_linked_argmax'] == 1
+    assert report['max_links_per_page'] == 1
+    assert report['max_links_per_page_argmax'] == 2
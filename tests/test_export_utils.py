@@ -0,0 +1,35 @@
+import pandas as pd
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+import pytest
+
+from export_utils import ResultWriter
+
+
+@pytest.mark.parametrize("extension, read", [
+    (".parquet", lambda path: pq.read_table(path).to_pandas()),
+    (".arrow", lambda path: feather.read_table(path).to_pandas()),
+])
+def test_columns_missing_from_the_first_chunk_take_later_values(tmp_path, extension, read):
+    path = str(tmp_path / f"results{extension}")
+    empty = pd.DataFrame({"url": ["https://example.com/a"], "anchors": [None],
+                          "source": pd.Categorical([None])})
+    filled = pd.DataFrame({"url": ["https://example.com/b"], "anchors": ["best slots"],
+                           "source": pd.Categorical(["AI + Keywords"])})
+    with ResultWriter(path) as writer:
+        writer.write(empty)
+        writer.write(filled)
+
+    result = read(path)
+    assert result["url"].tolist() == ["https://example.com/a", "https://example.com/b"]
+    assert result["anchors"].tolist()[1] == "best slots"
+    assert pd.isna(result["anchors"].tolist()[0])
+    assert result["source"].astype(object).tolist()[1] == "AI + Keywords"
+
+
+def test_csv_chunks_share_one_header(tmp_path):
+    path = str(tmp_path / "results.csv")
+    with ResultWriter(path) as writer:
+        writer.write(pd.DataFrame({"url": ["a"], "anchors": [None]}))
+        writer.write(pd.DataFrame({"url": ["b"], "anchors": ["best slots"]}))
+    assert pd.read_csv(path)["url"].tolist() == ["a", "b"]
@@ -0,0 +1,129 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from cache_utils import PageCache
+from fetch_utils import PageFetcher
+from metrics_utils import PipelineMetrics
+
+PAGE = """<html><head><title>Page {number}</title></head><body>
+<nav>menu links</nav><main><p>Main text of page {number} about roulette odds.</p></main>
+<footer>footer</footer></body></html>"""
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        number = self.path.strip("/")
+        etag = f'"page-{number}"'
+        self.server.requests.append(self.path)
+        if self.server.tracker:
+            self.server.tracker.enter()
+            time.sleep(self.server.delay)
+            self.server.tracker.leave()
+        if self.headers.get("If-None-Match") == etag:
+            self.server.not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        body = PAGE.format(number=number).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class InFlightTracker:
+    """Requests served at once across servers, and how many were started before any finished"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.first_wave = None
+
+    def enter(self):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def leave(self):
+        with self.lock:
+            if self.first_wave is None:
+                self.first_wave = self.in_flight
+            self.in_flight -= 1
+
+
+def start_server(tracker=None, delay=0.0):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    httpd.requests = []
+    httpd.not_modified = 0
+    httpd.tracker = tracker
+    httpd.delay = delay
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def stop_server(httpd):
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    httpd = start_server()
+    yield httpd
+    stop_server(httpd)
+
+
+def test_second_fetch_revalidates_and_reuses_cached_text(server, tmp_path):
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base}/{number}" for number in range(20)]
+    fetcher = PageFetcher(PageCache(str(tmp_path / "pages.sqlite3")), concurrency=8, per_host_concurrency=4)
+
+    first_metrics = PipelineMetrics()
+    first = fetcher.fetch(urls, first_metrics)
+    assert first_metrics.report()["counters"] == {"pages_fetched": 20}
+    assert first[urls[3]] == "Page 3 Main text of page 3 about roulette odds."
+    assert server.not_modified == 0
+
+    second_metrics = PipelineMetrics()
+    second = fetcher.fetch(urls, second_metrics)
+    assert second_metrics.report()["counters"] == {"pages_not_modified": 20}
+    assert server.not_modified == 20
+    assert second == first
+
+
+def test_fresh_cached_pages_are_not_requested(server, tmp_path):
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base}/{number}" for number in range(5)]
+    cache = PageCache(str(tmp_path / "pages.sqlite3"))
+    first = PageFetcher(cache).fetch(urls)
+
+    metrics = PipelineMetrics()
+    assert PageFetcher(cache, max_age=3600).fetch(urls, metrics) == first
+    assert metrics.report()["counters"] == {"pages_fresh": 5}
+    assert len(server.requests) == 5
+
+
+def test_busy_host_does_not_hold_back_other_hosts():
+    tracker = InFlightTracker()
+    servers = [start_server(tracker, delay=0.2) for _ in range(2)]
+    try:
+        # Hosts differ by port; URLs sorted by host queue all of the first host's pages first
+        urls = [f"http://127.0.0.1:{httpd.server_address[1]}/{number}" for httpd in servers for number in range(6)]
+        texts = PageFetcher(concurrency=4, per_host_concurrency=2).fetch(urls)
+    finally:
+        for httpd in servers:
+            stop_server(httpd)
+    assert all(texts[url] for url in urls)
+    # Both hosts are served from the start, filling every global slot
+    assert tracker.first_wave == 4
+    assert tracker.max_in_flight == 4
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from scipy import sparse
+
+from index_utils import build_link_index, get_language_block, match_links_batch, top_k_candidates, transform_texts
+
+
+def dense_top_k(scores, top_k):
+    """Reference ranking: a stable argsort over every column, ties by position"""
+    columns = np.argsort(-scores, axis=1, kind='stable')[:, :top_k]
+    return columns, np.take_along_axis(scores, columns, axis=1)
+
+
+@pytest.mark.parametrize("top_k", [1, 3, 7])
+def test_top_k_candidates_matches_dense_argsort(top_k):
+    rng = np.random.default_rng(0)
+    # Few distinct values so ties are common, plenty of zeros and some all-zero rows
+    dense = rng.integers(0, 4, size=(200, 12)) * (rng.random((200, 12)) < 0.3) / 4
+    dense[::17] = 0
+    dense[5] = 0.5
+
+    columns, values = top_k_candidates(sparse.csr_matrix(dense), top_k)
+    expected_columns, expected_values = dense_top_k(dense, top_k)
+    np.testing.assert_array_equal(columns, expected_columns)
+    np.testing.assert_array_equal(values, expected_values)
+
+
+@pytest.mark.parametrize("top_k", [1, 3, 7])
+def test_match_links_batch_matches_brute_force(top_k):
+    words = ["poker", "casino", "bonus", "slots", "roulette", "odds", "football", "tennis"]
+    rng = np.random.default_rng(1)
+    topics = [" ".join(rng.choice(words, size=3)) for _ in range(40)]
+    langs = ["en", "es"] * 20
+    index = build_link_index(topics, [f"https://example.com/{i}" for i in range(40)], langs)
+
+    # Repeated topics tie on score; the last text shares no term with any page
+    texts = [" ".join(rng.choice(words, size=2)) for _ in range(30)] + [topics[0], "nothing in common"]
+    prefixes = ["en", "es", "fr"] * 10 + ["en", "es"]
+    rows, scores = match_links_batch(index, texts, prefixes, top_k=top_k)
+
+    text_matrix = transform_texts(index, texts, prefixes)
+    for position, prefix in enumerate(prefixes):
+        block = get_language_block(index, prefix)
+        k = min(top_k, len(block['rows']))
+        similarities = (text_matrix[position] @ block['matrix'].T).toarray()
+        columns, values = dense_top_k(similarities, k)
+        np.testing.assert_array_equal(rows[position, :k], block['rows'][columns[0]])
+        np.testing.assert_allclose(scores[position, :k], values[0])
+    assert (scores[-1] == 0).all()
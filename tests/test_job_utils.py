@@ -0,0 +1,79 @@
+import pandas as pd
+import pytest
+
+from anchor_utils import match_links_checkpointed
+from assignment_utils import LinkAssigner
+
+LINK_INDEX = {"content_hash": "test-index"}
+OPPORTUNITIES = pd.DataFrame({
+    "page": ["https://blog.example.org/a", "https://blog.example.org/b",
+             "https://blog.example.org/c", "https://blog.example.org/d"],
+    "anchor": ["slots", "poker", "slots bonus", "roulette"],
+})
+
+
+class FakePipeline:
+    """Links every opportunity through the assigner to p1, else p2; can fail once on a chunk"""
+
+    __name__ = "fake_pipeline"
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.chunks = []
+
+    def __call__(self, chunk, internal_links_df, anchor_col, opp_url_col, *columns, progress_callback=None,
+                 link_index=None, metrics=None, assigner=None):
+        anchors = chunk[anchor_col].tolist()
+        if self.fail_on in anchors:
+            raise RuntimeError("worker crashed")
+        self.chunks.append(anchors)
+        urls = chunk[opp_url_col].tolist()
+        slots = assigner.assign(urls, [["p1", "p2"]] * len(urls), [[0.9, 0.5]] * len(urls))
+        links = [["p1", "p2"][slot] if slot >= 0 else None for slot in slots]
+        if progress_callback:
+            progress_callback(len(urls), len(urls))
+        links_df = pd.DataFrame({
+            "Opportunity URL": urls, "Original Anchor": anchors, "Suggested Internal Link": links,
+            "Detected Language": ["en"] * len(urls),
+        })
+        anchors_df = pd.DataFrame({
+            "Opportunity URL": urls, "Original Anchor": anchors, "Suggested Anchor Text": anchors,
+            "Source": ["AI + Keywords"] * len(urls),
+        })
+        return links_df, anchors_df
+
+
+def run(job_dir, pipeline, assigner, progress=None, opportunities=OPPORTUNITIES):
+    return match_links_checkpointed(
+        opportunities, None, "anchor", "page", "topic", "url", "lang", str(job_dir), chunk_rows=2,
+        progress_callback=(lambda done, total: progress.append((done, total))) if progress is not None else None,
+        link_index=LINK_INDEX, pipeline=pipeline, assigner=assigner
+    )
+
+
+def test_resumed_job_runs_only_the_remaining_chunks(tmp_path):
+    crashing = FakePipeline(fail_on="slots bonus")
+    with pytest.raises(RuntimeError):
+        run(tmp_path, crashing, LinkAssigner(max_links_per_page=3))
+    assert crashing.chunks == [["slots", "poker"]]
+
+    resumed = FakePipeline()
+    progress = []
+    assigner = LinkAssigner(max_links_per_page=3)
+    links_df, anchors_df = run(tmp_path, resumed, assigner, progress)
+    assert resumed.chunks == [["slots bonus", "roulette"]]
+    # Progress starts from the manifest, not from zero
+    assert progress[0] == (2, 4)
+    assert progress[-1] == (4, 4)
+    # The restored chunk's two links count towards p1's cap of three
+    assert links_df["Suggested Internal Link"].tolist() == ["p1", "p1", "p1", "p2"]
+    assert anchors_df["Original Anchor"].tolist() == OPPORTUNITIES["anchor"].tolist()
+    assert assigner.page_links == {"p1": 3, "p2": 1}
+
+
+def test_other_job_in_the_same_directory_is_rejected(tmp_path):
+    run(tmp_path, FakePipeline(), LinkAssigner(max_links_per_page=3))
+    with pytest.raises(ValueError, match="different job"):
+        run(tmp_path, FakePipeline(), LinkAssigner(max_links_per_page=3), opportunities=OPPORTUNITIES.iloc[:3])
+    with pytest.raises(ValueError, match="different job"):
+        run(tmp_path, FakePipeline(), LinkAssigner(max_links_per_page=2))
@@ -0,0 +1,83 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from anchor_utils import prepare_link_index
+from cache_utils import AnchorCache
+from service import MicroBatcher, SuggestionService
+
+
+@pytest.fixture(scope="module")
+def link_index():
+    links = pd.DataFrame({
+        "url": [f"https://example.com/{slug}" for slug in ("slots", "poker", "roulette", "blackjack")],
+        "topic": ["online slots bonus", "poker tournament strategy", "roulette betting systems",
+                  "blackjack card counting"],
+        "lang": ["en"] * 4,
+    })
+    return prepare_link_index(links, "topic", "url", "lang")
+
+
+def test_micro_batcher_groups_items_and_maps_results():
+    batches = []
+    release = threading.Event()
+
+    def process(items):
+        release.wait(5)
+        batches.append(list(items))
+        return [item * 10 for item in items]
+
+    batcher = MicroBatcher(process, max_batch_size=3, max_wait_ms=50)
+    futures = [batcher.submit(item) for item in range(5)]
+    release.set()
+    assert [future.result(timeout=5) for future in futures] == [0, 10, 20, 30, 40]
+    assert all(len(batch) <= 3 for batch in batches)
+    assert sorted(item for batch in batches for item in batch) == list(range(5))
+
+
+def test_micro_batcher_fails_every_future_of_a_failed_batch():
+    def process(items):
+        raise RuntimeError("boom")
+
+    batcher = MicroBatcher(process, max_batch_size=4, max_wait_ms=20)
+    futures = [batcher.submit(item) for item in range(2)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="boom"):
+            future.result(timeout=5)
+
+
+def test_keywords_do_not_depend_on_the_rest_of_the_batch(link_index):
+    service = SuggestionService(link_index)
+    request = {"url": "https://example.com/post", "text": "slots bonus guide for new slots players",
+               "lang": "en", "top_k": 1}
+    others = [{"url": f"https://example.com/other-{n}", "text": "slots slots bonus poker night", "lang": "en",
+               "top_k": 1} for n in range(3)]
+
+    alone = service.match_batch([request])[0]
+    batched = service.match_batch([request] + others)[0]
+    assert alone["keywords"] == batched["keywords"]
+    assert alone["_job"][2] == batched["_job"][2]
+
+
+def test_anchor_batch_reuses_cached_anchors(link_index, fake_model):
+    service = SuggestionService(link_index, cache=AnchorCache(":memory:"))
+    jobs = [(f"https://example.com/{n} text about {topic}", topic, [topic, "guide"], "en")
+            for n, topic in enumerate(["slots", "poker"])]
+
+    first = service.anchor_batch(jobs)
+    calls = len(fake_model.prompts)
+    assert calls == 1
+    assert service.anchor_batch(jobs) == first
+    assert len(fake_model.prompts) == calls
+    assert service.metrics.report()["counters"]["anchors_llm"] == 2
+
+
+def test_suggest_returns_links_and_anchors(link_index, fake_model):
+    service = SuggestionService(link_index, local_anchors=False)
+    response = service.suggest({"url": "https://example.com/post", "text": "poker tournament strategy tips",
+                                "lang": "en", "top_k": 2})
+    assert response["links"][0]["url"] == "https://example.com/poker"
+    assert len(response["links"]) <= 2
+    assert response["source"] == "AI + Keywords"
+    assert response["anchors"]